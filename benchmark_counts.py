@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Timing of the bincount counting kernel (offsets_aggregates.count_table)
+against the pandas calls it replaced, on the projects and on the project
+cube, with a check that both give the same tables:
+
+    python benchmark_counts.py [--workbook data/...xlsx] [--repeat 50]
+"""
+
+import argparse
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from offsets_aggregates import AGGREGATES, count_frame, count_pivot, count_table
+from offsets_data import EXCEL_PATH, SHEET_NAME, SKIP_ROWS, latest_workbook, load_dataset
+
+
+def pandas_calls(df):
+    """name -> (pandas call, kernel call), each returning a comparable frame."""
+    counted = "Counts" in df.columns
+
+    def value_counts(col):
+        if counted:
+            return df.groupby(col, observed=True)["Counts"].sum()
+        return df[col].value_counts().sort_index()
+
+    def pivot(rows, cols):
+        if counted:
+            return df.pivot_table(index=rows, columns=cols, values="Counts", aggfunc="sum", observed=True).fillna(0)
+        return pd.crosstab(df[rows], df[cols])
+
+    def kernel_1d(col, values="Counts"):
+        table, labels = count_table(df, col, values=values)
+        return pd.Series(table, index=labels)
+
+    return {
+        "Registry counts": (lambda: value_counts("Voluntary_Registry"), lambda: kernel_1d("Voluntary_Registry")),
+        "Type counts": (lambda: value_counts("Type"), lambda: kernel_1d("Type")),
+        "Scope x Type": (
+            lambda: pivot("Scope", "Type").stack().loc[lambda s: s > 0],
+            lambda: count_frame(df, "Scope", "Type", dropna=True).set_index(["Scope", "Type"])["Counts"],
+        ),
+        "Country x Registry": (
+            lambda: pivot("Country", "Voluntary_Registry"),
+            lambda: count_pivot(df, "Country", "Voluntary_Registry"),
+        ),
+        "Issued by Registry": (
+            lambda: df.pivot_table(index="Voluntary_Registry", values="Total_Credits_Issued",
+                                   aggfunc="sum", observed=True)["Total_Credits_Issued"],
+            lambda: kernel_1d("Voluntary_Registry", "Total_Credits_Issued"),
+        ),
+    }
+
+
+def same(a, b):
+    a, b = np.asarray(a, dtype="float64"), np.asarray(b, dtype="float64")
+    return a.shape == b.shape and np.allclose(a, b)
+
+
+def empty_sections(df, names):
+    """Sections that fail or return rows on an empty slice of `df` (a filter
+    state nothing matches), which the page must be able to draw as "No data"."""
+    failed = []
+    for name, (fn, cols) in AGGREGATES.items():
+        if not cols.issubset(df.columns):
+            continue
+        try:
+            if len(fn(df.iloc[:0], names)):
+                failed.append(name)
+        except Exception as exc:
+            failed.append(f"{name} ({type(exc).__name__}: {exc})")
+    return failed
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the counting kernel")
+    parser.add_argument("--workbook", default=None,
+                        help="workbook to load (default: newest release next to %s)" % EXCEL_PATH)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    dataset = load_dataset(args.workbook or latest_workbook(EXCEL_PATH), SHEET_NAME, SKIP_ROWS)
+    for label, df in (("projects", dataset.df), ("cube", dataset.cube.frame)):
+        print(f"{label} ({len(df):,} rows)")
+        for name, (reference, kernel) in pandas_calls(df).items():
+            ok = same(reference(), kernel())
+            ref_ms, kernel_ms = best_of(reference, args.repeat), best_of(kernel, args.repeat)
+            print(f"  {name:<20} pandas {ref_ms:7.2f} ms   bincount {kernel_ms:7.2f} ms   "
+                  f"x{ref_ms / kernel_ms:5.1f}{'' if ok else '   MISMATCH'}")
+        failed = empty_sections(df, dataset.country_names)
+        print(f"  empty selection      {'ok' if not failed else 'FAILED: ' + ', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,406 @@
+# -*- coding: utf-8 -*-
+"""
+Section aggregates of the carbon dashboard as plain functions of a projects
+frame, shared by the Streamlit script and the offline precompute command.
+They take either the projects themselves or a slice of the project cube
+(offsets_cube), whose "Counts" column already counts projects per row.
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+import pycountry
+
+# Columns behind the cascading sidebar options (Region -> Country, ... -> Type)
+CASCADE_COLS = ["Region", "Country", "Scope", "Type"]
+# Credit columns the sections sum; everything else a section needs is a grouping
+CREDIT_COLS = ["Total_Credits_Issued", "Total_Credits_Retired", "Total_Credits_Remaining"]
+# Registries with a map of their own, with the other names they may go by
+MAP_REGISTRIES = {
+    "VCS": ["Verra", "Verified Carbon Standard"],
+    "GOLD": ["Gold Standard"],
+    "ACR": ["American Carbon Registry"],
+    "CAR": ["Climate Action Reserve"],
+}
+# Registries stacked in the top countries chart, with their alternates
+TOP_REGISTRIES = {
+    "ACR": ["American Carbon Registry"],
+    "ART": ["Architecture for REDD+ Transactions", "ART TREES"],
+    "CAR": ["Climate Action Reserve"],
+    "GOLD": ["Gold Standard"],
+    "VCS": ["Verra", "Verified Carbon Standard"],
+}
+TOP_K_CHOICES = [10, 20, 50]
+REST_OF_WORLD = "Rest of world"
+
+
+def counts_by(df, cols):
+    # Observed combinations only, with categorical labels turned back into plain
+    # values so plotly and the pivots don't expand unused categories.
+    # Cube rows carry their project counts, so those are rolled up instead
+    grouped = df.groupby(cols, observed=True, dropna=False)
+    out = (grouped["Counts"].sum() if "Counts" in df.columns else grouped.size()).reset_index(name="Counts")
+    for c in cols:
+        if isinstance(out[c].dtype, pd.CategoricalDtype):
+            out[c] = out[c].astype(object)
+    return out
+
+
+# ============== COUNTING KERNEL ==============
+def codes_of(col, dropna=True):
+    """(codes, labels) of a column: the integer codes categorical columns
+    already store, or codes of the sorted distinct values of any other.
+    Missing values get code -1, or with dropna=False a label of their own
+    after the others (where groupby(dropna=False) puts them)."""
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        codes, labels = col.cat.codes.to_numpy().astype(np.int64), pd.Index(col.cat.categories)
+    else:
+        codes, labels = pd.factorize(col, sort=True)
+        codes, labels = codes.astype(np.int64), pd.Index(labels)
+    if not dropna and (codes < 0).any():
+        codes = np.where(codes < 0, len(labels), codes)
+        labels = labels.astype(object).append(pd.Index([np.nan], dtype=object))
+    return codes, labels
+
+
+def count_table(df, rows, cols=None, values="Counts", dropna=True):
+    """Dense table of `values` summed by the labels of column `rows` (and
+    `cols`) of `df`, from one bincount over the combined integer codes.
+    Without a `values` column each row counts 1, so "Counts" works on
+    projects as well as on cube rows.
+
+    Returns (table, row labels) or (table, row labels, column labels),
+    keeping only labels that occur, in label order."""
+    r, row_labels = codes_of(df[rows], dropna)
+    if cols is None:
+        c, col_labels = np.zeros_like(r), pd.Index([None])
+    else:
+        c, col_labels = codes_of(df[cols], dropna)
+    keep = (r >= 0) & (c >= 0)
+    shape = (len(row_labels), len(col_labels))
+    combined = r[keep] * shape[1] + c[keep]
+    table = np.bincount(combined, minlength=shape[0] * shape[1]).reshape(shape)
+    seen = table > 0
+    if values in df.columns:
+        weights = df[values].to_numpy(dtype="float64", na_value=0)[keep]
+        table = np.bincount(combined, weights=weights, minlength=shape[0] * shape[1]).reshape(shape)
+        if pd.api.types.is_integer_dtype(df[values].dtype):
+            table = table.round().astype(np.int64)
+    in_rows, in_cols = seen.any(axis=1), seen.any(axis=0)
+    if cols is None:
+        # The single column stays even when nothing is seen (an empty selection)
+        return table[in_rows, 0], row_labels[in_rows]
+    return table[in_rows][:, in_cols], row_labels[in_rows], col_labels[in_cols]
+
+
+def count_frame(df, rows, cols=None, dropna=False):
+    """Long-form "Counts" of the observed labels of `rows` (and `cols`), as
+    counts_by() would return them, from count_table()."""
+    if cols is None:
+        table, row_labels = count_table(df, rows, dropna=dropna)
+        return pd.DataFrame({rows: np.asarray(row_labels, dtype=object), "Counts": table})
+    table, row_labels, col_labels = count_table(df, rows, cols, dropna=dropna)
+    i, j = np.nonzero(table)  # every observed pair holds at least one project
+    return pd.DataFrame({
+        rows: np.asarray(row_labels, dtype=object)[i],
+        cols: np.asarray(col_labels, dtype=object)[j],
+        "Counts": table[i, j],
+    })
+
+
+def count_pivot(df, rows, cols, values="Counts"):
+    """rows x cols table of summed `values` as pivot_table(aggfunc="sum")
+    followed by fillna(0) would give it (missing labels left out)."""
+    table, row_labels, col_labels = count_table(df, rows, cols, values)
+    return pd.DataFrame(
+        table,
+        index=pd.Index(np.asarray(row_labels, dtype=object), name=rows),
+        columns=pd.Index(np.asarray(col_labels, dtype=object), name=cols),
+    )
+
+
+# ============== COUNTRY NAMES ==============
+def standardize_country(name):
+    try:
+        return pycountry.countries.lookup(name).name
+    except Exception:
+        return name
+
+
+def country_iso3(name):
+    try:
+        return pycountry.countries.lookup(name).alpha_3
+    except Exception:
+        return None
+
+
+def country_table(countries):
+    """Raw country label -> pycountry name and ISO-3 code."""
+    countries = list(countries)
+    return pd.DataFrame({
+        "Country": countries,
+        "Country_Name": [standardize_country(c) for c in countries],
+        "ISO3": [country_iso3(c) for c in countries],
+    })
+
+
+# ============== CASCADING OPTIONS ==============
+def cascade_table(df):
+    """Distinct Region/Country/Scope/Type combinations; the sidebar derives
+    dependent options from this instead of the full frame."""
+    cols = [c for c in CASCADE_COLS if c in df.columns]
+    return counts_by(df, cols).drop(columns="Counts")
+
+
+# ============== SECTION AGGREGATES ==============
+def registry_counts(df, names=None):
+    return count_frame(df, "Voluntary_Registry")
+
+
+def redrem_counts(df, names=None):
+    return count_frame(df, "Reduction_Removal")
+
+
+def credits_by_redrem(df, names=None):
+    sums = {}
+    for c in CREDIT_COLS:
+        sums[c], labels = count_table(df, "Reduction_Removal", values=c, dropna=False)
+    credits_by_rr = pd.DataFrame(sums, index=pd.Index(np.asarray(labels, dtype=object), name="Reduction_Removal"))
+
+    # Enforce Issued = Retired + Remaining for display
+    credits_by_rr["Total_Credits_Issued_calc"] = (
+        credits_by_rr["Total_Credits_Retired"] + credits_by_rr["Total_Credits_Remaining"]
+    )
+    return credits_by_rr
+
+
+def redrem_by_registry(df, names=None):
+    return (
+        count_frame(df, "Voluntary_Registry", "Reduction_Removal")
+        .sort_values(["Voluntary_Registry", "Reduction_Removal"])
+    )
+
+
+def scope_type(df, names=None, type_col="Type"):
+    return count_frame(df, "Scope", type_col).sort_values(["Scope", type_col])
+
+
+def registry_scope_type(df, names=None, type_col="Type"):
+    return (
+        counts_by(df, ["Voluntary_Registry", "Scope", type_col])
+        .sort_values(["Voluntary_Registry", "Scope", type_col])
+    )
+
+
+def country_counts(df, names):
+    mapping = count_frame(df, "Country")
+    mapping["Country"] = mapping["Country"].map(names)
+    return mapping
+
+
+def country_by_registry(df, names):
+    # Country x Registry project counts (every project has an ID, so counting
+    # rows counts IDs). Only registries that get a map become columns; every
+    # country keeps its row
+    table, countries, registries = count_table(df, "Country", "Voluntary_Registry", dropna=False)
+    mapped = set(MAP_REGISTRIES).union(*MAP_REGISTRIES.values())
+    cols = [k for k, r in enumerate(registries) if r in mapped]
+    rows = np.asarray(countries.notna())
+    four_blocks = pd.DataFrame(table[rows][:, cols], columns=registries[cols].astype(str))
+    four_blocks.insert(0, "Country", np.asarray(countries[rows], dtype=object))
+
+    # Normalize country names
+    four_blocks["Country"] = four_blocks["Country"].map(names)
+    return four_blocks
+
+
+def vintage_by_registry(df, names=None):
+    # Pivot: rows = vintage years, columns = registries, values = project counts
+    pivot_vintage = count_pivot(df, "First_Vintage_Year", "Voluntary_Registry")
+
+    # Ensure datetime type for plotting
+    pivot_vintage.index = pd.to_datetime(
+        pd.Index(pd.to_numeric(pivot_vintage.index, errors="coerce")).astype("Int64").astype(str),
+        format="%Y",
+    ).rename("First_Vintage_Year")
+    return pivot_vintage
+
+
+def registry_by_country(df, names=None, k=TOP_K_CHOICES[0], rest=False):
+    # Projects per registry of the top countries only (see top_countries)
+    return top_countries(df, k, rest)
+
+
+# ============== VINTAGE CREDITS ==============
+def credits_by_vintage(vintages, rows, n_projects):
+    """Credits per vintage year of the projects at `rows` (sorted positions,
+    None = all) from the long vintage sheets ({sheet: (Project ID, Vintage,
+    value, project_row)}): one column per sheet value, years ascending."""
+    picked = None
+    if rows is not None:
+        picked = np.zeros(n_projects + 1, dtype=bool)  # last slot: project_row -1
+        picked[rows] = True
+    out = {}
+    for v in vintages.values():
+        value = next(c for c in v.columns if c not in ("Project ID", "Vintage", "project_row"))
+        years = v["Vintage"].to_numpy().astype(np.int64)
+        weights = v[value].to_numpy(dtype="float64")
+        if picked is not None:
+            keep = picked[v["project_row"].to_numpy()]
+            years, weights = years[keep], weights[keep]
+        if len(years):
+            lo = years.min()
+            sums = np.bincount(years - lo, weights=weights)
+            out[value] = pd.Series(sums, index=np.arange(lo, lo + len(sums)))
+    table = pd.DataFrame(out).fillna(0).rename_axis("Vintage")
+    return table[(table != 0).any(axis=1)].astype(np.int64)
+
+
+# ============== TOP COUNTRIES ==============
+def top_countries(df, k=10, rest=False):
+    """The `k` countries of `df` (projects or cube rows) with most projects
+    in the TOP_REGISTRIES, most first (ties in label order): Country, one
+    column per registry and their "Sum". With `rest`, a last REST_OF_WORLD
+    row holds every other country.
+
+    The winners come from a partial selection over per-country totals, and
+    only their rows are broken down by registry."""
+    country, countries = codes_of(df["Country"])
+    registry, registries = codes_of(df["Voluntary_Registry"])
+    weights = df["Counts"].to_numpy(dtype=np.int64) if "Counts" in df.columns else np.ones(len(df), np.int64)
+    # Registry label -> TOP_REGISTRIES column (alternates included), -1 for others
+    slot_of = {name: j for j, (short, alts) in enumerate(TOP_REGISTRIES.items()) for name in [short] + alts}
+    slots = np.array([slot_of.get(r, -1) for r in registries] + [-1], dtype=np.int64)[registry]
+    known = country >= 0
+    listed = known & (slots >= 0)
+
+    # Countries present in `df` compete, even with no project in the registries
+    present = np.flatnonzero(np.bincount(country[known], minlength=len(countries)))
+    totals = np.bincount(country[listed], weights=weights[listed], minlength=len(countries)).astype(np.int64)[present]
+    k = min(k, len(present))
+    if k < len(present):
+        # Ties at the k-th total are broken by label order, like a stable sort
+        kth = totals[np.argpartition(-totals, k - 1)[k - 1]]
+        above = np.flatnonzero(totals > kth)
+        top = np.concatenate([above, np.flatnonzero(totals == kth)[:k - len(above)]])
+    else:
+        top = np.arange(k)
+    top = top[np.lexsort((top, -totals[top]))]
+
+    rank = np.full(len(countries) + 1, -1, dtype=np.int64)  # last slot: missing country
+    rank[present[top]] = np.arange(k)
+    rank = rank[country]
+    winners = listed & (rank >= 0)
+    n = len(TOP_REGISTRIES)
+    matrix = np.bincount(rank[winners] * n + slots[winners], weights=weights[winners], minlength=k * n)
+    out = pd.DataFrame(matrix.reshape(k, n).astype(np.int64), columns=list(TOP_REGISTRIES))
+    out.insert(0, "Country", np.asarray(countries, dtype=object)[present[top]])
+    out["Sum"] = totals[top]
+    if rest and k < len(present):
+        others = listed & (rank < 0)
+        others = np.bincount(slots[others], weights=weights[others], minlength=n).astype(np.int64)
+        out.loc[len(out)] = [REST_OF_WORLD, *others, others.sum()]
+    return out
+
+
+# name -> (function, columns it needs)
+AGGREGATES = {
+    "registry_counts": (registry_counts, {"Voluntary_Registry"}),
+    "redrem_counts": (redrem_counts, {"Reduction_Removal"}),
+    "credits_by_redrem": (
+        credits_by_redrem,
+        {"Reduction_Removal", "Total_Credits_Issued", "Total_Credits_Retired", "Total_Credits_Remaining"},
+    ),
+    "redrem_by_registry": (redrem_by_registry, {"Voluntary_Registry", "Reduction_Removal"}),
+    "scope_type": (scope_type, {"Scope", "Type"}),
+    "registry_scope_type": (registry_scope_type, {"Voluntary_Registry", "Scope", "Type"}),
+    "country_counts": (country_counts, {"Country"}),
+    "country_by_registry": (country_by_registry, {"Country", "Voluntary_Registry"}),
+    "vintage_by_registry": (vintage_by_registry, {"Voluntary_Registry", "First_Vintage_Year"}),
+    "registry_by_country": (registry_by_country, {"Voluntary_Registry", "Country"}),
+}
+
+
+# ============== AGGREGATION PLAN ==============
+def plan_grain(sections):
+    """(dims, sums) of the finest grouping that every section in `sections`
+    ({name: (function, columns)}) is a roll-up of."""
+    needed = set().union(*(cols for _, cols in sections.values()))
+    sums = [c for c in CREDIT_COLS if c in needed]
+    return sorted(needed - set(sums)), sums
+
+
+def grain_table(df, dims, sums):
+    """One group-by of `df` at `dims`: "Counts" and the sum of each of `sums`."""
+    grouped = df.groupby(dims, observed=True, dropna=False)
+    counts = grouped["Counts"].sum() if "Counts" in df.columns else grouped.size()
+    table = counts.to_frame("Counts")
+    if sums:
+        table = table.join(grouped[sums].sum())
+    return table.reset_index()
+
+
+def sections_of(columns, only=None):
+    """Sections ({name: (function, columns)}) computable from `columns`,
+    limited to the names in `only` when given."""
+    return {
+        name: entry for name, entry in AGGREGATES.items()
+        if entry[1].issubset(columns) and (only is None or name in only)
+    }
+
+
+def planned_grain(df, sections, report=None):
+    """The grain table of `df` every one of `sections` rolls up from.
+    `report`, when given, is filled in with the plan: grain, rows in and out
+    and group-by passes over `df` saved."""
+    t0 = time.perf_counter()
+    dims, sums = plan_grain(sections)
+    grain = grain_table(df, dims, sums)
+    if report is not None:
+        report.update({
+            "grain": dims,
+            "rows": len(df),
+            "grain_rows": len(grain),
+            "sections": len(sections),
+            "passes_saved": len(sections) - 1,
+            "ms": round((time.perf_counter() - t0) * 1000, 1),
+        })
+    return grain
+
+
+def compute_aggregates(df, names, report=None):
+    """Every section aggregate of `df` whose columns are present: a single
+    group-by at the finest grain the sections share, then a roll-up of that
+    table per section."""
+    if df.empty:
+        return {}
+    sections = sections_of(df.columns)
+    grain = planned_grain(df, sections, report)
+    return {name: fn(grain, names) for name, (fn, _) in sections.items()}
+
+
+# ============== LAZY EVALUATION ==============
+class LazyGraph:
+    """Named nodes, each a function of the graph that reads the nodes it
+    depends on (graph["name"]). A node runs the first time it is read and
+    never when nothing reads it, so work behind a section that isn't drawn
+    costs nothing."""
+
+    def __init__(self):
+        self._nodes = {}
+        self._values = {}
+        self.evaluated = []  # in evaluation order
+        self.reports = []  # notes left by nodes, e.g. aggregation plans
+
+    def add(self, name, fn):
+        self._nodes[name] = fn
+
+    def __getitem__(self, name):
+        if name not in self._values:
+            self._values[name] = self._nodes[name](self)
+            self.evaluated.append(name)
+        return self._values[name]
+
+    def __len__(self):
+        return len(self._nodes)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Project cube: project counts and credit sums per observed combination of the
+categorical dimensions, built once per dataset. Section aggregates are
+roll-ups of a slice of it, so their cost follows the number of combinations
+rather than the number of projects.
+"""
+
+import numpy as np
+
+from offsets_filters import BitmapIndex, SortedIndex
+
+CUBE_DIMS = [
+    "Voluntary_Registry", "Region", "Country", "Scope", "Type",
+    "Reduction_Removal", "Voluntary_Status", "First_Vintage_Year",
+]
+CUBE_SUMS = [
+    "Total_Credits_Issued", "Total_Credits_Retired", "Total_Credits_Remaining",
+    "Total_Buffer_Pool_Deposits", "Reversals_Covered_by_Buffer",
+    "Reversals_Not_Covered_by_Buffer", "Buffer_Credits_Released",
+]
+# Numeric dimensions, so their range sliders slice cells too
+CUBE_RANGES = ["First_Vintage_Year"]
+
+
+def cube_table(df, dims=CUBE_DIMS, sums=CUBE_SUMS):
+    """(cube, cells): one row per observed combination of `dims` (missing
+    values included) with "Counts" and the sum of each of `sums`, and the
+    cube row of every project."""
+    dims = [c for c in dims if c in df.columns]
+    sums = [c for c in sums if c in df.columns]
+    cells = df.groupby(dims, observed=True, dropna=False, sort=True).ngroup().to_numpy().astype(np.int32)
+    first = np.unique(cells, return_index=True)[1]
+    cube = df[dims].iloc[first].reset_index(drop=True)
+    cube["Counts"] = np.bincount(cells, minlength=len(first))
+    for c in sums:
+        cube[c] = df[c].groupby(cells).sum().to_numpy()
+    return cube, cells
+
+
+class ProjectCube:
+    """The cube of a dataset with bitmap and range indexes over its cells, so
+    sidebar filters on dimensions select cells the way they select rows."""
+
+    def __init__(self, cube, cells, df, bitmaps=None, ranges=None):
+        self.frame = cube
+        self.cells = np.asarray(cells, dtype=np.int32)
+        self.df = df  # project measures, for re-aggregating a row selection
+        self.dims = [c for c in CUBE_DIMS if c in cube.columns]
+        self.sums = [c for c in CUBE_SUMS if c in cube.columns]
+        # Prebuilt indexes (memory-mapped artifacts) are used as they are
+        self.bitmaps = bitmaps if bitmaps is not None else BitmapIndex(cube, self.dims)
+        if ranges is None:
+            ranges = SortedIndex(cube, [c for c in CUBE_RANGES if c in cube.columns])
+        self.ranges = ranges
+
+    def __len__(self):
+        return len(self.frame)
+
+    def covers(self, cols):
+        """Whether filters on `cols` can be resolved on the cells alone."""
+        return all(c in self.bitmaps.bitmaps or c in self.ranges.order for c in cols)
+
+    def slice(self, selections, ranges=None, masks=()):
+        """Cells matching `selections` ({dimension: values}), `ranges`
+        ({numeric dimension: (lo, hi)}) and cell bitmaps in `masks`."""
+        masks = [self.ranges.bitmap(col, lo, hi) for col, (lo, hi) in (ranges or {}).items()] + list(masks)
+        cells = self.bitmaps.select(selections, masks)
+        return self.frame if cells is None else self.frame.iloc[cells].reset_index(drop=True)
+
+    def rollup(self, rows):
+        """The cube of just the projects at `rows`, for filters on columns
+        that aren't dimensions (e.g. credit ranges)."""
+        cells = self.cells[rows]
+        counts = np.bincount(cells, minlength=len(self.frame))
+        keep = np.flatnonzero(counts)
+        out = self.frame.iloc[keep].reset_index(drop=True)
+        out["Counts"] = counts[keep]
+        for c in self.sums:
+            values = self.df[c].iloc[rows].to_numpy(dtype="float64", na_value=0)
+            out[c] = np.bincount(cells, weights=values, minlength=len(self.frame))[keep].astype(out[c].dtype)
+        return out
@@ -0,0 +1,1185 @@
+# -*- coding: utf-8 -*-
+"""
+Data layer for the carbon dashboard: reads the Berkeley offsets workbook,
+normalizes the PROJECTS sheet and keeps a columnar snapshot of the result
+next to the workbook so later starts skip the Excel parse.
+"""
+
+import argparse
+import functools
+import glob
+import hashlib
+import inspect
+import json
+import logging
+import math
+import multiprocessing
+import os
+import re
+import threading
+import time
+import tracemalloc
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from offsets_aggregates import cascade_table, compute_aggregates, country_table
+from offsets_cube import ProjectCube, cube_table
+from offsets_filters import BitmapIndex, CascadeOptions, SortedIndex
+from offsets_search import TrigramIndex
+
+log = logging.getLogger(__name__)
+
+# The published workbook the dashboard and the offline tools read by default
+# (or the newest release next to it), and where its PROJECTS table starts
+EXCEL_PATH = r"data/Voluntary-Registry-Offsets-Database--v2025-06.xlsx"
+SHEET_NAME = "PROJECTS"
+SKIP_ROWS = 3
+
+# ============== NORMALIZATION RULES ==============
+# Friendly renames (after normalization)
+RENAMES = {
+    "Voluntary Registry": "Voluntary_Registry",
+    "Voluntary Status": "Voluntary_Status",
+    "Type": "Type",
+    "Total Credits Issued": "Total_Credits_Issued",
+    "Total Credits Retired": "Total_Credits_Retired",
+    "Total Credits Remaining": "Total_Credits_Remaining",
+    "Total Buffer Pool Deposits": "Total_Buffer_Pool_Deposits",
+    "Reversals Covered by Buffer Pool": "Reversals_Covered_by_Buffer",
+    "Reversals Not Covered by Buffer": "Reversals_Not_Covered_by_Buffer",
+    "Buffer Credits Released to Project": "Buffer_Credits_Released",
+    "ARB / WA Project": "ARB_WA_Project",
+    "First Year of Project (Vintage)": "First_Vintage_Year",
+    "Methodology / Protocol": "Methodology_Protocol",
+    "Methodology Version": "Methodology_Version",
+    "Project Site Location": "Project_Site_Location",
+    "Project Developer": "Project_Developer",
+    "Reduction / Removal": "Reduction_Removal",
+}
+
+# Keep only columns we need
+WANTED_COLS = [
+    "Project ID", "Project Name", "Voluntary_Registry", "ARB_WA_Project", "Voluntary_Status",
+    "Scope", "Type", "Reduction_Removal", "Methodology_Protocol", "Methodology_Version",
+    "Region", "Country", "State", "Project_Site_Location", "Project_Developer",
+    "Total_Credits_Issued", "Total_Credits_Retired", "Total_Credits_Remaining",
+    "Total_Buffer_Pool_Deposits", "Reversals_Covered_by_Buffer", "Reversals_Not_Covered_by_Buffer",
+    "Buffer_Credits_Released", "First_Vintage_Year"
+]
+
+# Credit columns coerced to numbers (blanks -> 0)
+NUMERIC_COLS = [
+    "Total_Credits_Issued", "Total_Credits_Retired", "Total_Credits_Remaining",
+    "Total_Buffer_Pool_Deposits", "Reversals_Covered_by_Buffer", "Reversals_Not_Covered_by_Buffer",
+    "Buffer_Credits_Released"
+]
+
+# Year columns coerced to numbers (blanks stay missing)
+YEAR_COLS = ["First_Vintage_Year"]
+
+# Category columns whose blanks become "Unknown"
+UNKNOWN_FILL_COLS = ["Voluntary_Registry", "Scope", "Type", "Reduction_Removal", "Region", "Country"]
+
+# Low-cardinality text columns stored as Categoricals (categories sorted)
+CATEGORY_COLS = [
+    "Voluntary_Registry", "Region", "Country", "Scope", "Type", "Reduction_Removal", "Voluntary_Status"
+]
+
+# Vintage-level sheets: one row per project, one column per vintage year. They
+# are melted to (Project ID, Vintage, value) and joined to PROJECTS on Project ID.
+VINTAGE_SHEETS = {
+    "ISSUANCES": {"skip_rows": 3, "value": "Credits_Issued"},
+    "RETIREMENTS": {"skip_rows": 3, "value": "Credits_Retired"},
+}
+
+# Vintage year headers, e.g. "2019" (or 2019.0 when Excel stored a number)
+YEAR_HEADER = re.compile(r"(\d{4})(?:\.0)?")
+
+# Bump when the snapshot layout changes in a way the rules above don't capture
+SNAPSHOT_FORMAT = 3
+
+# Strings pandas treats as missing by default; the streaming reader mirrors them
+NA_STRINGS = frozenset([
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+    "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+])
+
+
+def fix_col(c):
+    # Normalize column names: strip, collapse spaces, replace \n, unify separators
+    c = str(c).replace("\n", " ").strip()
+    c = " ".join(c.split())  # collapse repeated spaces
+    return c
+
+
+def normalize_projects(df):
+    df.columns = [fix_col(c) for c in df.columns]
+    df = df.rename(columns={k: v for k, v in RENAMES.items() if k in df.columns})
+
+    existing = [c for c in WANTED_COLS if c in df.columns]
+    df = df[existing].copy()
+
+    # Basic cleaning
+    df = df[df["Project ID"].notna()]
+
+    # Coerce numeric credit cols
+    for c in NUMERIC_COLS:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
+    for c in YEAR_COLS:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+
+    # Fill category NAs
+    for c in UNKNOWN_FILL_COLS:
+        if c in df.columns:
+            df[c] = df[c].fillna("Unknown")
+
+    # Excel hands back mixed cell types in text columns (e.g. 1.0 next to "v2");
+    # store them as strings so every reader produces the same frame
+    for c in df.columns:
+        if c not in NUMERIC_COLS and c not in YEAR_COLS:
+            df[c] = df[c].astype(str).where(df[c].notna())
+
+    return df
+
+
+# ============== COMPACT DTYPES ==============
+def smallest_int_dtype(values):
+    """Smallest signed integer dtype holding every value exactly, or None."""
+    values = np.asarray(values, dtype="float64")
+    if values.size == 0:
+        return np.dtype("int8")
+    if not np.isfinite(values).all() or not (values == np.floor(values)).all():
+        return None
+    lo, hi = values.min(), values.max()
+    for dt in ("int8", "int16", "int32", "int64"):
+        info = np.iinfo(dt)
+        if info.min <= lo and hi <= info.max:
+            return np.dtype(dt)
+    return None
+
+
+def compact_projects(df):
+    """Categoricals for the filter dimensions, smallest exact ints for credits
+    and a nullable Int16 vintage year."""
+    df = df.copy()
+    for c in CATEGORY_COLS:
+        if c in df.columns:
+            cats = sorted(df[c].dropna().unique())
+            df[c] = pd.Categorical(df[c], categories=cats)
+    for c in NUMERIC_COLS:
+        if c in df.columns:
+            dt = smallest_int_dtype(df[c])
+            if dt is not None:
+                df[c] = df[c].astype(dt)
+    for c in YEAR_COLS:
+        if c in df.columns:
+            years = df[c].round()
+            if years.dropna().between(np.iinfo("int16").min, np.iinfo("int16").max).all():
+                df[c] = years.astype("Int16")
+    return df
+
+
+def memory_report(before, after):
+    """Per-column bytes of two versions of the same frame, largest saving first."""
+    b = before.memory_usage(deep=True, index=False)
+    a = after.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        "dtype_before": before.dtypes.astype(str),
+        "dtype_after": after.dtypes.astype(str),
+        "bytes_before": b,
+        "bytes_after": a,
+    })
+    report["saved"] = report["bytes_before"] - report["bytes_after"]
+    report = report.sort_values("saved", ascending=False)
+    report.loc["TOTAL"] = ["", "", b.sum(), a.sum(), b.sum() - a.sum()]
+    return report
+
+
+# ============== STREAMING READER ==============
+def _num_cell(v):
+    if v is None or isinstance(v, bool):
+        return math.nan
+    if isinstance(v, (int, float)):
+        return float(v)
+    try:
+        return float(str(v).strip())
+    except ValueError:
+        return math.nan
+
+
+def _text_cell(v):
+    # Same conversions pandas applies to openpyxl cells
+    if isinstance(v, str):
+        return None if v.strip() in NA_STRINGS else v
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    return v
+
+
+def stream_projects(path, sheet_name, skip_rows):
+    """Read only the WANTED_COLS of the sheet with openpyxl in read-only mode.
+
+    The header row (first row after skip_rows) goes through fix_col/RENAMES,
+    then each data row is unpacked straight into per-column arrays; unwanted
+    cells are never converted or stored.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb[sheet_name].iter_rows(min_row=skip_rows + 1, values_only=True)
+        header = [fix_col(c) for c in next(rows, ())]
+        header = [RENAMES.get(c, c) for c in header]
+
+        positions = {}
+        for i, c in enumerate(header):
+            positions.setdefault(c, i)
+        cols = [c for c in WANTED_COLS if c in positions]
+        if "Project ID" not in cols:
+            raise KeyError(f"'Project ID' header not found in sheet {sheet_name!r}")
+        picks = [positions[c] for c in cols]
+        is_num = [c in NUMERIC_COLS or c in YEAR_COLS for c in cols]
+        data = [array("d") if num else [] for num in is_num]
+        id_pos = positions["Project ID"]
+        width = max(picks) + 1
+
+        for row in rows:
+            if len(row) < width:
+                row = tuple(row) + (None,) * (width - len(row))
+            if _text_cell(row[id_pos]) is None:
+                continue
+            for out, i, num in zip(data, picks, is_num):
+                v = row[i]
+                out.append(_num_cell(v) if num else _text_cell(v))
+    finally:
+        wb.close()
+
+    frame = {
+        c: (np.frombuffer(out, dtype="float64") if num else pd.array(out, dtype=object))
+        for c, out, num in zip(cols, data, is_num)
+    }
+    return normalize_projects(pd.DataFrame(frame))
+
+
+def stream_vintages(path, sheet_name, spec):
+    """Long (Project ID, Vintage, value) table of a vintage sheet, streamed the
+    same way as stream_projects; zero and blank cells are skipped. Returns
+    None when the workbook has no such sheet."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet_name not in wb.sheetnames:
+            return None
+        rows = wb[sheet_name].iter_rows(min_row=spec["skip_rows"] + 1, values_only=True)
+        header = [fix_col(c) for c in next(rows, ())]
+        header = [RENAMES.get(c, c) for c in header]
+        if "Project ID" not in header:
+            raise KeyError(f"'Project ID' header not found in sheet {sheet_name!r}")
+        id_pos = header.index("Project ID")
+        years = [(i, int(m.group(1))) for i, c in enumerate(header) if (m := YEAR_HEADER.fullmatch(c))]
+
+        ids, vintages, values = [], array("h"), array("d")
+        for row in rows:
+            pid = _text_cell(row[id_pos]) if id_pos < len(row) else None
+            if pid is None:
+                continue
+            pid = str(pid)
+            for i, year in years:
+                v = _num_cell(row[i]) if i < len(row) else math.nan
+                if v == v and v != 0:
+                    ids.append(pid)
+                    vintages.append(year)
+                    values.append(v)
+    finally:
+        wb.close()
+
+    value = spec["value"]
+    df = pd.DataFrame({
+        "Project ID": pd.Categorical(ids),
+        "Vintage": np.frombuffer(vintages, dtype="int16"),
+        value: np.frombuffer(values, dtype="float64"),
+    })
+    dt = smallest_int_dtype(df[value])
+    if dt is not None:
+        df[value] = df[value].astype(dt)
+    return df
+
+
+def profile_ingestion(path, sheet_name, skip_rows):
+    """Parse time and peak traced memory of pd.read_excel vs stream_projects."""
+    readers = {
+        "read_excel": lambda: normalize_projects(
+            pd.read_excel(path, sheet_name=sheet_name, skiprows=skip_rows)
+        ),
+        "streaming": lambda: stream_projects(path, sheet_name, skip_rows),
+    }
+    report = {}
+    for name, read in readers.items():
+        t0 = time.perf_counter()
+        df = read()
+        seconds = time.perf_counter() - t0
+
+        # Separate pass so tracing overhead doesn't skew the timing
+        tracemalloc.start()
+        try:
+            read()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        report[name] = {"seconds": seconds, "peak_mb": peak / 2**20, "rows": len(df)}
+    return report
+
+
+# ============== SNAPSHOT CACHE ==============
+def file_digest(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def rules_fingerprint(sheet_name, skip_rows):
+    rules = {
+        "format": SNAPSHOT_FORMAT,
+        "sheet_name": sheet_name,
+        "skip_rows": skip_rows,
+        "fix_col": inspect.getsource(fix_col),
+        "renames": RENAMES,
+        "wanted": WANTED_COLS,
+        "numeric": NUMERIC_COLS,
+        "years": YEAR_COLS,
+        "unknown_fill": UNKNOWN_FILL_COLS,
+        "categories": CATEGORY_COLS,
+    }
+    blob = json.dumps(rules, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+def vintage_fingerprint(sheet_name, spec):
+    rules = {
+        "format": SNAPSHOT_FORMAT,
+        "sheet_name": sheet_name,
+        "spec": spec,
+        "fix_col": inspect.getsource(fix_col),
+        "renames": RENAMES,
+        "year_header": YEAR_HEADER.pattern,
+    }
+    blob = json.dumps(rules, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(blob).hexdigest()
+
+
+def snapshot_key(digest, fingerprint):
+    return hashlib.sha256((digest + fingerprint).encode("ascii")).hexdigest()
+
+
+def snapshot_path(path, sheet_name, key):
+    stem, _ = os.path.splitext(path)
+    return f"{stem}.{sheet_name}.{key[:16]}.parquet"
+
+
+def _prune_snapshots(path, sheet_name, keep):
+    stem, _ = os.path.splitext(path)
+    for old in glob.glob(f"{glob.escape(stem)}.{glob.escape(sheet_name)}.*.parquet"):
+        if os.path.abspath(old) != os.path.abspath(keep):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def write_snapshot(df, snap):
+    tmp = f"{snap}.{os.getpid()}.tmp"
+    try:
+        df.to_parquet(tmp)
+        os.replace(tmp, snap)  # readers never see a half-written file
+        return True
+    except Exception as exc:  # read-only data dir, pyarrow missing, ...
+        log.warning("Could not write snapshot %s: %s", snap, exc)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return False
+
+
+def read_snapshot(snap):
+    if os.path.exists(snap):
+        try:
+            return pd.read_parquet(snap)
+        except Exception as exc:
+            log.warning("Ignoring unreadable snapshot %s: %s", snap, exc)
+    return None
+
+
+def cached_sheet(path, sheet_name, fingerprint, build, digest=None):
+    """Frame for one sheet, served from its Parquet snapshot when the workbook
+    and the sheet's normalization rules are unchanged since it was written;
+    otherwise `build()` parses it and the snapshot is rewritten."""
+    digest = digest or file_digest(path)
+    snap = snapshot_path(path, sheet_name, snapshot_key(digest, fingerprint))
+
+    df = read_snapshot(snap)
+    if df is not None:
+        return df
+
+    t0 = time.perf_counter()
+    df = build()
+    if df is None:
+        return None
+    log.info("Parsed %s [%s] in %.2fs", path, sheet_name, time.perf_counter() - t0)
+
+    if write_snapshot(df, snap):
+        _prune_snapshots(path, sheet_name, keep=snap)
+    return df
+
+
+def _sheet_plan(path, sheet_name, skip_rows):
+    # (fingerprint, build) for PROJECTS-style or vintage sheets
+    if sheet_name in VINTAGE_SHEETS:
+        spec = VINTAGE_SHEETS[sheet_name]
+        return vintage_fingerprint(sheet_name, spec), functools.partial(stream_vintages, path, sheet_name, spec)
+    return rules_fingerprint(sheet_name, skip_rows), functools.partial(_build_projects, path, sheet_name, skip_rows)
+
+
+def _build_projects(path, sheet_name, skip_rows):
+    return compact_projects(stream_projects(path, sheet_name, skip_rows))
+
+
+def read_projects(path, sheet_name, skip_rows, digest=None):
+    fingerprint, build = _sheet_plan(path, sheet_name, skip_rows)
+    return cached_sheet(path, sheet_name, fingerprint, build, digest)
+
+
+def _load_sheet_job(path, sheet_name, skip_rows, digest):
+    # Runs in a worker process: parse one sheet and land it in the snapshot
+    # cache, then hand back the snapshot path instead of pickling the frame
+    fingerprint, build = _sheet_plan(path, sheet_name, skip_rows)
+    df = cached_sheet(path, sheet_name, fingerprint, build, digest)
+    if df is None:
+        return None
+    snap = snapshot_path(path, sheet_name, snapshot_key(digest, fingerprint))
+    return snap if os.path.exists(snap) else df
+
+
+def workbook_sheets(path):
+    """Sheet names of a workbook, from its index alone (no cells are read)."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def load_sheets(path, sheet_names, skip_rows, digest=None):
+    """Cleaned frames for several sheets of one workbook, keyed by sheet name.
+
+    Snapshot hits are read directly. Misses are parsed concurrently, one sheet
+    per worker process, so a cold load takes about as long as the largest
+    sheet. A single miss, or a single CPU, is parsed in this process instead,
+    where spawning workers costs more than it saves. Optional sheets missing
+    from the workbook are left out without being parsed.
+    """
+    t0 = time.perf_counter()
+    digest = digest or file_digest(path)
+    frames, misses = {}, []
+    for name in sheet_names:
+        fingerprint, _ = _sheet_plan(path, name, skip_rows)
+        df = read_snapshot(snapshot_path(path, name, snapshot_key(digest, fingerprint)))
+        if df is None:
+            misses.append(name)
+        else:
+            frames[name] = df
+    if misses:
+        present = set(workbook_sheets(path))
+        misses = [name for name in misses if name in present or name not in VINTAGE_SHEETS]
+
+    workers = min(len(misses), os.cpu_count() or 1)
+    if workers == 1:
+        results = {name: read_projects(path, name, skip_rows, digest) for name in misses}
+    elif misses:
+        # spawn: forking a threaded Streamlit server can deadlock the children
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            futures = {name: pool.submit(_load_sheet_job, path, name, skip_rows, digest) for name in misses}
+            results = {name: fut.result() for name, fut in futures.items()}
+    else:
+        results = {}
+
+    for name, out in results.items():
+        if out is not None:
+            frames[name] = pd.read_parquet(out) if isinstance(out, str) else out
+    if misses:
+        log.info("Loaded %d sheet(s) of %s in %.2fs (%d parsed)",
+                 len(frames), path, time.perf_counter() - t0, len(misses))
+    return {name: frames[name] for name in sheet_names if name in frames}
+
+
+# ============== LIVE DATASET ==============
+# Sidebar filter dimensions
+FILTER_COLS = ["Region", "Country", "Scope", "Type", "Voluntary_Registry", "Reduction_Removal"]
+# Sidebar range sliders
+RANGE_COLS = [
+    "Total_Credits_Issued", "Total_Credits_Retired", "Total_Credits_Remaining",
+    "Total_Buffer_Pool_Deposits", "First_Vintage_Year",
+]
+
+
+def release_label(path):
+    # "...Database--v2025-06.xlsx" -> "v2025-06"
+    m = re.search(r"--(v[\w.-]+?)\.xlsx?$", os.path.basename(path))
+    return m.group(1) if m else os.path.basename(path)
+
+
+def latest_workbook(path):
+    """Newest release sitting next to `path` (same name up to "--v"), else `path`."""
+    folder, name = os.path.split(path)
+    if "--v" not in name:
+        return path
+    prefix, ext = name.rsplit("--v", 1)[0], os.path.splitext(name)[1]
+    pattern = os.path.join(glob.escape(folder or "."), glob.escape(prefix) + "--v*" + glob.escape(ext))
+    found = sorted(glob.glob(pattern))
+    return found[-1] if found else path
+
+
+class ProjectsDataset:
+    """One release of the cleaned projects table plus everything derived from
+    it. Built completely before it is published, never mutated afterwards."""
+
+    def __init__(self, df, path, version, vintages=None, derived=None):
+        self.df = df
+        self.path = path
+        self.version = version
+        self.release = release_label(path)
+
+        # Pieces precompute.py may have built already; anything missing is derived here
+        derived = derived or {}
+        self.options = derived.get("options") or {
+            c: sorted(df[c].dropna().unique().tolist()) for c in FILTER_COLS if c in df.columns
+        }
+        self.cascade = derived.get("cascade")
+        if self.cascade is None:
+            self.cascade = cascade_table(df)
+        # Region -> Country and Scope (+ Region, Country) -> Type lookups
+        self.cascade_options = CascadeOptions(self.cascade)
+        self.countries = derived.get("countries")
+        if self.countries is None:
+            self.countries = country_table(self.options.get("Country", []))
+        self.country_names = dict(zip(self.countries["Country"], self.countries["Country_Name"]))
+        # Counts and credit sums per combination of the categorical dimensions;
+        # every section aggregate is a roll-up of (a slice of) it
+        cube, cells = derived.get("cube"), derived.get("cube_cells")
+        if cube is None or cells is None:
+            cube, cells = cube_table(df)
+        indexes = derived.get("indexes") or {}
+        self.cube = ProjectCube(cube, cells, df, indexes.get("cube_bitmaps"), indexes.get("cube_ranges"))
+        # Section aggregates of the unfiltered view
+        self.aggregates = derived.get("aggregates")
+        if self.aggregates is None:
+            self.aggregates = compute_aggregates(self.cube.frame, self.country_names)
+        # Serialized figures of the unfiltered view; precompute.py or a warm-up
+        # hook (DatasetStore's `prepare`) fills them in before publishing
+        self.figures = derived.get("figures") or {}
+
+        # Sidebar filters resolve through one bitmap per (column, value)
+        self.bitmaps = indexes.get("bitmaps") or BitmapIndex(df, FILTER_COLS)
+        # Range sliders resolve through presorted row orders
+        self.ranges = indexes.get("ranges") or SortedIndex(df, RANGE_COLS)
+        # Table search over Project ID and Project Name
+        self.search = indexes.get("search") or TrigramIndex(df)
+
+        # Hash index Project ID -> row position (first occurrence wins)
+        ids = df["Project ID"]
+        first = ~ids.duplicated().to_numpy()
+        self.id_index = pd.Index(ids.to_numpy()[first])
+        self._id_rows = np.flatnonzero(first)
+
+        self.vintages = {
+            name: v if "project_row" in v.columns else self.join_projects(v)
+            for name, v in (vintages or {}).items()
+        }
+
+    def project_rows(self, ids):
+        """Row positions in df for the given Project IDs, -1 where unknown."""
+        if isinstance(ids.dtype, pd.CategoricalDtype):
+            # Hash each distinct ID once, then broadcast through the codes
+            pos = self.id_index.get_indexer(ids.cat.categories)
+            pos = np.append(pos, -1)[ids.cat.codes.to_numpy()]  # code -1 (NaN) -> -1
+        else:
+            pos = self.id_index.get_indexer(ids)
+        return np.where(pos >= 0, self._id_rows[pos], -1).astype("int32")
+
+    def join_projects(self, frame):
+        return frame.assign(project_row=self.project_rows(frame["Project ID"]))
+
+
+def load_dataset(path, sheet_name, skip_rows, use_artifacts=True):
+    """Current dataset for `path`. With `use_artifacts`, the first process to
+    see a workbook version writes precomputed/<version>/ and every process
+    (this one included) then serves the memory-mapped copy."""
+    digest = file_digest(path)
+    if use_artifacts:
+        dataset = read_artifacts(path, digest[:12], sheet_name, skip_rows)
+        if dataset is not None:
+            return dataset
+    frames = load_sheets(path, [sheet_name, *VINTAGE_SHEETS], skip_rows, digest=digest)
+    df = frames.pop(sheet_name)
+    dataset = ProjectsDataset(df, path, version=digest[:12], vintages=frames)
+    if use_artifacts:
+        try:
+            write_artifacts(dataset, sheet_name, skip_rows)
+        except OSError as exc:
+            log.warning("Could not write shared artifacts (%s), serving a private copy", exc)
+            return dataset
+        return read_artifacts(path, dataset.version, sheet_name, skip_rows) or dataset
+    return dataset
+
+
+# ============== PRECOMPUTED ARTIFACTS ==============
+# Bump when the artifact layout or the aggregate definitions change
+ARTIFACT_FORMAT = 5
+
+
+def artifacts_dir(path, version):
+    return os.path.join(os.path.dirname(path), "precomputed", version)
+
+
+def write_arrow(df, target):
+    import pyarrow as pa
+
+    table = df if isinstance(df, pa.Table) else pa.Table.from_pandas(df)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, target)
+
+
+def map_arrow(source):
+    # Arrow IPC file memory-mapped read-only; the OS pages it in on demand
+    import pyarrow as pa
+
+    return pa.ipc.open_file(pa.memory_map(source, "r")).read_all()
+
+
+def write_array(arr, target):
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(arr), allow_pickle=False)
+    os.replace(tmp, target)
+
+
+def map_array(source):
+    # .npy memory-mapped read-only, as a plain ndarray over the mapping
+    return np.asarray(np.load(source, mmap_mode="r", allow_pickle=False))
+
+
+def _arrow_text(dtype):
+    import pyarrow as pa
+
+    # Keep text Arrow-backed: pd.StringDtype("pyarrow") would recast to large_string
+    return pd.ArrowDtype(dtype) if pa.types.is_string(dtype) else None
+
+
+def mapped_frame(table):
+    """DataFrame over a memory-mapped Arrow table that borrows its buffers:
+    numbers and categorical codes are numpy views into the mapping and text
+    stays Arrow-backed, so processes mapping the same file share its pages.
+    One block per column keeps pandas from consolidating them into copies.
+    Columns with missing values are private copies, though: nullable ints
+    (First_Vintage_Year), categoricals whose nulls become -1 codes
+    (Voluntary_Status) and all-null columns.
+    """
+    return table.to_pandas(split_blocks=True, types_mapper=_arrow_text)
+
+
+def _write_json(obj, target):
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp, target)
+
+
+def write_indexes(dataset, folder):
+    """Arrays of the dataset's bitmap, range and search indexes (and of its
+    cube's) under indexes/; returns their manifest entry."""
+    import pyarrow as pa
+
+    os.makedirs(os.path.join(folder, "indexes"), exist_ok=True)
+
+    def save(name, arr):
+        write_array(arr, os.path.join(folder, f"indexes/{name}.npy"))
+        return f"indexes/{name}.npy"
+
+    entry = {}
+    for key, index in (("bitmaps", dataset.bitmaps), ("cube_bitmaps", dataset.cube.bitmaps)):
+        entry[key] = {"rows": index.n_rows, "columns": {
+            col: {"codes": save(f"{key}.{col}.codes", codes), "words": save(f"{key}.{col}.words", words),
+                  "labels": labels}
+            for col, (codes, labels, words) in index.parts().items()
+        }}
+    for key, index in (("ranges", dataset.ranges), ("cube_ranges", dataset.cube.ranges)):
+        entry[key] = {"rows": index.n_rows, "columns": {
+            col: {"order": save(f"{key}.{col}.order", order), "values": save(f"{key}.{col}.values", values)}
+            for col, (order, values) in index.parts().items()
+        }}
+    texts, grams, rows = dataset.search.parts()
+    write_arrow(pa.table({"text": texts}), os.path.join(folder, "indexes/search.texts.arrow"))
+    entry["search"] = {
+        "rows": dataset.search.n_rows, "texts": "indexes/search.texts.arrow",
+        "grams": save("search.grams", grams), "postings": save("search.rows", rows),
+    }
+    return entry
+
+
+def read_indexes(folder, entry):
+    """Indexes of write_indexes() over memory-mapped arrays."""
+    def load(name):
+        return map_array(os.path.join(folder, name))
+
+    indexes = {}
+    for key in ("bitmaps", "cube_bitmaps"):
+        indexes[key] = BitmapIndex.from_parts(entry[key]["rows"], {
+            col: (load(f["codes"]), f["labels"], load(f["words"])) for col, f in entry[key]["columns"].items()
+        })
+    for key in ("ranges", "cube_ranges"):
+        indexes[key] = SortedIndex.from_parts(entry[key]["rows"], {
+            col: (load(f["order"]), load(f["values"])) for col, f in entry[key]["columns"].items()
+        })
+    search = entry["search"]
+    texts = map_arrow(os.path.join(folder, search["texts"])).column("text")
+    texts = texts.chunk(0) if texts.num_chunks == 1 else texts.combine_chunks()
+    indexes["search"] = TrigramIndex.from_parts(search["rows"], texts, load(search["grams"]), load(search["postings"]))
+    return indexes
+
+
+def write_artifacts(dataset, sheet_name, skip_rows):
+    """Write the dataset and everything derived from it under
+    precomputed/<version>/ next to the workbook; returns the folder."""
+    folder = artifacts_dir(dataset.path, dataset.version)
+    os.makedirs(os.path.join(folder, "aggregates"), exist_ok=True)
+    os.makedirs(os.path.join(folder, "vintages"), exist_ok=True)
+
+    files = {
+        "projects": "projects.arrow", "cascade": "cascade.arrow", "countries": "countries.arrow",
+        "cube": "cube.arrow", "cube_cells": "cube_cells.arrow",
+    }
+    write_arrow(dataset.df, os.path.join(folder, files["projects"]))
+    write_arrow(dataset.cascade, os.path.join(folder, files["cascade"]))
+    write_arrow(dataset.countries, os.path.join(folder, files["countries"]))
+    write_arrow(dataset.cube.frame, os.path.join(folder, files["cube"]))
+    write_arrow(pd.DataFrame({"cell": dataset.cube.cells}), os.path.join(folder, files["cube_cells"]))
+    for name, v in dataset.vintages.items():
+        files[f"vintages/{name}"] = f"vintages/{name}.arrow"
+        write_arrow(v, os.path.join(folder, files[f"vintages/{name}"]))
+    for name, table in dataset.aggregates.items():
+        files[f"aggregates/{name}"] = f"aggregates/{name}.arrow"
+        write_arrow(table, os.path.join(folder, files[f"aggregates/{name}"]))
+    _write_json(dataset.options, os.path.join(folder, "options.json"))
+    indexes = write_indexes(dataset, folder)
+    if dataset.figures:
+        _write_json(dataset.figures, os.path.join(folder, "figures.json"))
+
+    # Manifest last: a folder without one is ignored by read_artifacts
+    manifest = {
+        "format": ARTIFACT_FORMAT,
+        "version": dataset.version,
+        "release": dataset.release,
+        "workbook": os.path.basename(dataset.path),
+        "rules": rules_fingerprint(sheet_name, skip_rows),
+        "built": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "files": files,
+        "indexes": indexes,
+        "figures": "figures.json" if dataset.figures else None,
+    }
+    _write_json(manifest, os.path.join(folder, "manifest.json"))
+    return folder
+
+
+def read_artifacts(path, version, sheet_name, skip_rows):
+    """ProjectsDataset from precomputed/<version>/, or None when there is no
+    complete build for this workbook version and these rules."""
+    folder = artifacts_dir(path, version)
+    try:
+        with open(os.path.join(folder, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if manifest.get("format") != ARTIFACT_FORMAT or manifest.get("rules") != rules_fingerprint(sheet_name, skip_rows):
+        log.info("Ignoring stale artifacts in %s", folder)
+        return None
+
+    try:
+        files = manifest["files"]
+        tables = {key: mapped_frame(map_arrow(os.path.join(folder, name))) for key, name in files.items()}
+        with open(os.path.join(folder, "options.json"), encoding="utf-8") as f:
+            options = json.load(f)
+        indexes = read_indexes(folder, manifest["indexes"])
+        figures = {}
+        if manifest.get("figures"):
+            with open(os.path.join(folder, manifest["figures"]), encoding="utf-8") as f:
+                figures = json.load(f)
+    except Exception as exc:
+        log.warning("Ignoring unreadable artifacts in %s: %s", folder, exc)
+        return None
+
+    derived = {
+        "options": options,
+        "figures": figures,
+        "indexes": indexes,
+        "cascade": tables.pop("cascade"),
+        "countries": tables.pop("countries"),
+        "cube": tables.pop("cube"),
+        "cube_cells": tables.pop("cube_cells")["cell"].to_numpy(),
+        "aggregates": {k.split("/", 1)[1]: v for k, v in tables.items() if k.startswith("aggregates/")},
+    }
+    vintages = {k.split("/", 1)[1]: v for k, v in tables.items() if k.startswith("vintages/")}
+    log.info("Loaded precomputed artifacts from %s", folder)
+    return ProjectsDataset(tables["projects"], path, version, vintages=vintages, derived=derived)
+
+
+class DatasetStore:
+    """Process-wide holder of the current ProjectsDataset.
+
+    A daemon thread polls the workbook (and newer releases next to it); when
+    it changes, the new dataset is built off to the side and published with a
+    single reference swap. Readers grab `current` once per rerun, so a rerun
+    in flight keeps its snapshot and the next one sees the new release.
+    """
+
+    def __init__(self, path, sheet_name, skip_rows, poll_seconds=30, prepare=None):
+        self.path = path
+        self.sheet_name = sheet_name
+        self.skip_rows = skip_rows
+        self.poll_seconds = poll_seconds
+        # prepare(dataset) runs on every new dataset before it becomes current
+        self.prepare = prepare
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._seen = self._signature()
+        self._current = load_dataset(self._seen[0], sheet_name, skip_rows)
+        if prepare is not None:
+            prepare(self._current)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, name="dataset-watcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def current(self):
+        return self._current
+
+    def on_swap(self, fn):
+        # fn(old_dataset, new_dataset), called from the watcher thread
+        self._listeners.append(fn)
+
+    def stop(self):
+        self._stop.set()
+
+    def _signature(self):
+        path = latest_workbook(self.path)
+        st = os.stat(path)
+        return path, st.st_size, st.st_mtime_ns
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.refresh()
+            except Exception as exc:
+                # Typically a workbook still being copied in; retry next poll
+                log.warning("Dataset reload failed (%s), keeping %s", exc, self._current.release)
+
+    def refresh(self):
+        with self._lock:
+            sig = self._signature()
+            if sig == self._seen:
+                return False
+            new = load_dataset(sig[0], self.sheet_name, self.skip_rows)
+            if new.version == self._current.version:
+                self._seen = sig
+                return False
+            if self.prepare is not None:
+                self.prepare(new)
+            old, self._current = self._current, new
+            # Only now: a load or prepare that raised is retried on the next poll
+            self._seen = sig
+        log.info("Swapped dataset %s -> %s", old.release, new.release)
+        for fn in self._listeners:
+            try:
+                fn(old, new)
+            except Exception:
+                log.exception("Dataset swap listener failed")
+        return True
+
+
+# ============== RELEASE HISTORY ==============
+# Columns compared between releases
+HISTORY_CREDIT_COLS = [
+    "Total_Credits_Issued", "Total_Credits_Retired", "Total_Credits_Remaining", "Total_Buffer_Pool_Deposits"
+]
+
+
+class ReleaseArrays:
+    """One release as keyed arrays: Project IDs sorted, every column aligned to them."""
+
+    def __init__(self, release, df):
+        df = df.drop_duplicates("Project ID").sort_values("Project ID", kind="stable")
+        self.release = release
+        self.keys = df["Project ID"].to_numpy(dtype="U")
+        self.credits = {
+            c: df[c].to_numpy(dtype="int64") if c in df.columns else np.zeros(len(df), dtype="int64")
+            for c in HISTORY_CREDIT_COLS
+        }
+        # None for a missing status, as on the side of an added or removed project
+        status = df["Voluntary_Status"].astype(object)
+        self.status = status.where(status.notna(), None).to_numpy()
+        self.attrs = {c: df[c].astype(object).to_numpy() for c in FILTER_COLS if c in df.columns}
+
+    def locate(self, keys):
+        """Positions of `keys` in this release and whether each was found."""
+        pos = np.searchsorted(self.keys, keys)
+        if len(self.keys) == 0:
+            return pos, np.zeros(len(keys), dtype=bool)
+        found = self.keys[np.minimum(pos, len(self.keys) - 1)] == keys
+        return pos, found
+
+
+def diff_releases(old, new):
+    """Per-project changes from `old` to `new` (ReleaseArrays): added and
+    removed projects, credit deltas and status changes. Unchanged projects
+    are left out. Fully vectorized over the sorted key arrays."""
+    pos, found = old.locate(new.keys)
+    _, kept = new.locate(old.keys)
+    ni = np.flatnonzero(found)
+    oi = pos[found]
+    added = np.flatnonzero(~found)
+    removed = np.flatnonzero(~kept)
+
+    deltas = {c: new.credits[c][ni] - old.credits[c][oi] for c in HISTORY_CREDIT_COLS}
+    status_changed = old.status[oi] != new.status[ni]
+    changed = status_changed.copy()
+    for d in deltas.values():
+        changed |= d != 0
+    ni, oi = ni[changed], oi[changed]
+
+    parts = [
+        ("added", new, added, None, new.status[added],
+         {c: new.credits[c][added] for c in HISTORY_CREDIT_COLS}),
+        ("removed", old, removed, old.status[removed], None,
+         {c: -old.credits[c][removed] for c in HISTORY_CREDIT_COLS}),
+        ("changed", new, ni, old.status[oi], new.status[ni],
+         {c: deltas[c][changed] for c in HISTORY_CREDIT_COLS}),
+    ]
+    frames = []
+    for change, side, idx, before, after, delta in parts:
+        n = len(idx)
+        frame = {"Project ID": side.keys[idx], "Change": np.full(n, change, dtype=object)}
+        frame.update({c: v[idx] for c, v in side.attrs.items()})
+        frame["Status_Before"] = before if before is not None else np.full(n, None, dtype=object)
+        frame["Status_After"] = after if after is not None else np.full(n, None, dtype=object)
+        frame.update({f"Delta_{c}": v for c, v in delta.items()})
+        frames.append(pd.DataFrame(frame))
+    return pd.concat(frames, ignore_index=True)
+
+
+class ReleaseHistory:
+    """Append-only store of every ingested release.
+
+    Each release is written once as `release=<label>/projects.parquet` and
+    recorded in releases.json next to the release folders. The diff into a
+    release from each earlier-ingested one is stored with it as
+    `changes_from=<label>.parquet` by prepare_diffs(), so readers only load
+    it; a missing one is computed from per-release ReleaseArrays on demand.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._arrays = {}
+        self._diffs = {}
+        self._lock = threading.Lock()
+
+    def _manifest_path(self):
+        return os.path.join(self.root, "releases.json")
+
+    def manifest(self):
+        try:
+            with open(self._manifest_path(), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def releases(self):
+        return sorted(entry["release"] for entry in self.manifest())
+
+    def ingest(self, release, df, version):
+        """Store a release unless it is already in the history."""
+        with self._lock:
+            entries = self.manifest()
+            known = {e["release"]: e for e in entries}
+            if release in known:
+                if known[release]["version"] != version:
+                    log.warning("Release %s already in history with another version; keeping it", release)
+                return False
+
+            folder = os.path.join(self.root, f"release={release}")
+            os.makedirs(folder, exist_ok=True)
+            df = df.drop_duplicates("Project ID").sort_values("Project ID", kind="stable")
+            if not write_snapshot(df.reset_index(drop=True), os.path.join(folder, "projects.parquet")):
+                return False
+
+            entries.append({
+                "release": release, "version": version, "rows": len(df),
+                "ingested": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            })
+            tmp = f"{self._manifest_path()}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(sorted(entries, key=lambda e: e["release"]), f, indent=2)
+            os.replace(tmp, self._manifest_path())
+        log.info("Added release %s to history (%d projects)", release, len(df))
+        return True
+
+    def arrays(self, release):
+        if release not in self._arrays:
+            path = os.path.join(self.root, f"release={release}", "projects.parquet")
+            self._arrays[release] = ReleaseArrays(release, pd.read_parquet(path))
+        return self._arrays[release]
+
+    def diff_path(self, old, new):
+        return os.path.join(self.root, f"release={new}", f"changes_from={old}.parquet")
+
+    def diff(self, old, new):
+        key = (old, new)
+        if key not in self._diffs:
+            changes = read_snapshot(self.diff_path(old, new))
+            if changes is None:
+                changes = diff_releases(self.arrays(old), self.arrays(new))
+                write_snapshot(changes, self.diff_path(old, new))
+            self._diffs[key] = changes
+        return self._diffs[key]
+
+    def prepare_diffs(self, release):
+        """Compute and store the diff into `release` from every other release
+        in the history, so a comparison on the page is a file read."""
+        t0 = time.perf_counter()
+        others = [r for r in self.releases() if r != release]
+        for other in others:
+            self.diff(other, release)
+        if others:
+            log.info("Diffs into release %s from %d releases ready in %.2fs",
+                     release, len(others), time.perf_counter() - t0)
+
+
+# ============== SHARED MEMORY PROBE ==============
+def smaps_rollup():
+    """Resident memory of this process in kB, split into shared and private
+    pages (Linux /proc/self/smaps_rollup)."""
+    out = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if rest.strip().endswith("kB"):
+                out[key] = int(rest.split()[0])
+    return {
+        "rss": out.get("Rss", 0),
+        "pss": out.get("Pss", 0),
+        "shared": out.get("Shared_Clean", 0) + out.get("Shared_Dirty", 0),
+        "private": out.get("Private_Clean", 0) + out.get("Private_Dirty", 0),
+    }
+
+
+def _memory_probe(path, sheet_name, skip_rows, use_artifacts, barrier, results):
+    dataset = load_dataset(path, sheet_name, skip_rows, use_artifacts=use_artifacts)
+    df = dataset.df
+    # Touch every column the way reruns do: unfiltered and filtered aggregates
+    compute_aggregates(df, dataset.country_names)
+    for col in FILTER_COLS:
+        if dataset.options.get(col):
+            compute_aggregates(df[df[col].isin(dataset.options[col][:1])], dataset.country_names)
+    int(df.select_dtypes("number").sum().sum())
+    barrier.wait()  # everyone holds the dataset while memory is sampled
+    results.put(smaps_rollup())
+    barrier.wait()
+
+
+def probe_shared_memory(path, sheet_name, skip_rows, workers=(1, 2, 4), use_artifacts=True):
+    """Per-process memory with 1..n concurrent processes holding the dataset.
+    With mapped artifacts, private memory per process stays flat as processes
+    are added and PSS drops, since the table's pages are shared."""
+    load_dataset(path, sheet_name, skip_rows, use_artifacts=use_artifacts)  # build shared files once
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+    for n in workers:
+        barrier, results = ctx.Barrier(n), ctx.Queue()
+        procs = [
+            ctx.Process(target=_memory_probe, args=(path, sheet_name, skip_rows, use_artifacts, barrier, results))
+            for _ in range(n)
+        ]
+        for p in procs:
+            p.start()
+        samples = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+        rows.append({"workers": n, **{k: sum(s[k] for s in samples) / n / 1024 for k in samples[0]}})
+    return pd.DataFrame(rows).set_index("workers").round(1)
+
+
+# ============== CLI ==============
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offsets database utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    prof = sub.add_parser("profile-ingest", help="compare pd.read_excel with the streaming reader")
+    prof.add_argument("path")
+    prof.add_argument("--sheet", default=SHEET_NAME)
+    prof.add_argument("--skip-rows", type=int, default=SKIP_ROWS)
+
+    mem = sub.add_parser("memory-report", help="per-column memory of the plain vs compact frame")
+    mem.add_argument("path")
+    mem.add_argument("--sheet", default=SHEET_NAME)
+    mem.add_argument("--skip-rows", type=int, default=SKIP_ROWS)
+
+    hist = sub.add_parser("history-ingest", help="add release workbooks to the history store")
+    hist.add_argument("paths", nargs="+")
+    hist.add_argument("--root", help="history folder (default: history/ next to the first workbook)")
+    hist.add_argument("--sheet", default=SHEET_NAME)
+    hist.add_argument("--skip-rows", type=int, default=SKIP_ROWS)
+
+    shm = sub.add_parser("shared-memory", help="per-process memory with several processes on the mapped dataset")
+    shm.add_argument("path")
+    shm.add_argument("--sheet", default=SHEET_NAME)
+    shm.add_argument("--skip-rows", type=int, default=SKIP_ROWS)
+    shm.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    shm.add_argument("--private", action="store_true", help="load private copies instead of the mapped artifacts")
+
+    args = parser.parse_args(argv)
+    if args.command == "profile-ingest":
+        report = profile_ingestion(args.path, args.sheet, args.skip_rows)
+        for name, r in report.items():
+            print(f"{name:<12} {r['seconds']:8.2f} s  {r['peak_mb']:8.1f} MB peak  {r['rows']:,} rows")
+        base, new = report["read_excel"], report["streaming"]
+        print(f"{'saving':<12} {1 - new['seconds'] / base['seconds']:8.0%}    "
+              f"{1 - new['peak_mb'] / base['peak_mb']:8.0%}")
+    elif args.command == "memory-report":
+        plain = stream_projects(args.path, args.sheet, args.skip_rows)
+        with pd.option_context("display.width", 160, "display.max_columns", None, "display.max_rows", None):
+            print(memory_report(plain, compact_projects(plain)))
+    elif args.command == "history-ingest":
+        history = ReleaseHistory(args.root or os.path.join(os.path.dirname(args.paths[0]), "history"))
+        for path in args.paths:
+            digest = file_digest(path)
+            df = read_projects(path, args.sheet, args.skip_rows, digest=digest)
+            added = history.ingest(release_label(path), df, digest[:12])
+            print(f"{release_label(path):<12} {'added' if added else 'already present'}")
+    elif args.command == "shared-memory":
+        report = probe_shared_memory(args.path, args.sheet, args.skip_rows, args.workers,
+                                     use_artifacts=not args.private)
+        print("MB per process")
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+"""
+Plotly figures of the carbon dashboard, one builder per section aggregate, so
+the default (unfiltered) view can be built and serialized before the first
+session asks for it.
+"""
+
+import json
+import logging
+import textwrap
+import time
+
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from offsets_aggregates import MAP_REGISTRIES, TOP_REGISTRIES
+
+log = logging.getLogger(__name__)
+
+# ============== BACKGROUND SETTING ==============
+ST_BG = "#0e1117"
+
+# Define a global template that matches Streamlit dark
+pio.templates["st_dark"] = go.layout.Template(
+    layout=go.Layout(
+        paper_bgcolor=ST_BG,
+        plot_bgcolor=ST_BG,
+        font=dict(color="white", family="Plus Jakarta Sans"),
+        margin=dict(t=20, r=10, b=40, l=10),
+        xaxis=dict(tickfont=dict(color="white"), titlefont=dict(color="white")),
+        yaxis=dict(tickfont=dict(color="white"), titlefont=dict(color="white")),
+        legend=dict(font=dict(color="white")),
+        coloraxis=dict(
+            colorbar=dict(
+                tickfont=dict(color="white"),
+                titlefont=dict(color="white"),
+            )
+        ),
+    )
+)
+
+pio.templates.default = "st_dark"
+
+
+# Helper function for text wrapping
+def wrap_with_br(s: str, width: int = 12) -> str:
+    # Handle specific problematic cases
+    if s == "Long-Duration Removal":
+        return "Long-duration<br>Removal"
+
+    # Use textwrap to split into lines of at most `width` chars
+    lines = textwrap.wrap(str(s), width=width)
+    return "<br>".join(lines)
+
+
+# ============== SECTION FIGURES ==============
+# Each builder takes its section aggregate (a copy it may modify) and returns
+# a figure, or a list of figures for the per-registry maps.
+def registry_bar(counts_std):
+    counts_std["tick_label"] = counts_std["Voluntary_Registry"].apply(lambda s: wrap_with_br(s, 12))
+
+    fig_std = px.bar(
+        counts_std,
+        x="Voluntary_Registry",
+        y="Counts",
+        text="Counts",
+        color="Counts",
+        color_continuous_scale="viridis",
+        height=500
+    )
+
+    fig_std.update_xaxes(
+        ticktext=counts_std["tick_label"],
+        tickvals=counts_std["Voluntary_Registry"],
+        tickangle=0,
+        automargin=True,
+        tickfont=dict(size=11),
+    )
+
+    fig_std.update_traces(
+        hovertemplate="%{x}<br>Projects: %{y:,}<extra></extra>",
+        textposition="outside",
+        cliponaxis=False,
+    )
+
+    fig_std.update_layout(
+        showlegend=False,
+        margin=dict(t=20, r=10, b=30, l=10),
+        xaxis_title="Voluntary Registry",
+        yaxis_title="Number of Projects",
+    )
+    return fig_std
+
+
+def redrem_bar(counts_rr):
+    counts_rr["tick_label"] = counts_rr["Reduction_Removal"].apply(lambda s: wrap_with_br(s, 12))
+
+    fig_rr = px.bar(
+        counts_rr,
+        x="Reduction_Removal",
+        y="Counts",
+        text="Counts",
+        color="Counts",
+        color_continuous_scale="plasma",
+        height=500
+    )
+
+    fig_rr.update_xaxes(
+        ticktext=counts_rr["tick_label"],
+        tickvals=counts_rr["Reduction_Removal"],
+        tickangle=0,
+        automargin=True,
+        tickfont=dict(size=11),
+    )
+
+    fig_rr.update_traces(
+        hovertemplate="%{x}<br>Projects: %{y:,}<extra></extra>",
+        textposition="outside",
+        cliponaxis=False,
+    )
+
+    fig_rr.update_layout(
+        showlegend=False,
+        margin=dict(t=20, r=10, b=30, l=10),
+        xaxis_title="Reduction / Removal",
+        yaxis_title="Number of Projects",
+    )
+    return fig_rr
+
+
+def credits_chart(credits_by_rr):
+    # Plot: Retired + Remaining stacked, Issued as line
+    bar_df = credits_by_rr.reset_index()
+    bar_df["Reduction_Removal_wrapped"] = bar_df["Reduction_Removal"].apply(lambda s: wrap_with_br(s, 12))
+
+    # Create stacked bar chart for Retired + Remaining
+    fig_cr = go.Figure()
+
+    # Add stacked bars for Retired + Remaining
+    fig_cr.add_trace(go.Bar(
+        x=bar_df["Reduction_Removal_wrapped"],
+        y=bar_df["Total_Credits_Retired"],
+        name="Total Credits Retired",
+        marker_color="#ef4444",
+        text=bar_df["Total_Credits_Retired"],
+        texttemplate="%{text:,}",
+        textposition="outside",
+        hovertemplate="%{x}<br>Retired: %{y:,}<extra></extra>"
+    ))
+
+    fig_cr.add_trace(go.Bar(
+        x=bar_df["Reduction_Removal_wrapped"],
+        y=bar_df["Total_Credits_Remaining"],
+        name="Total Credits Remaining",
+        marker_color="#10b981",
+        text=bar_df["Total_Credits_Remaining"],
+        texttemplate="%{text:,}",
+        textposition="outside",
+        hovertemplate="%{x}<br>Remaining: %{y:,}<extra></extra>"
+    ))
+
+    # Add Issued as total line with markers
+    fig_cr.add_trace(go.Scatter(
+        x=bar_df["Reduction_Removal_wrapped"],
+        y=bar_df["Total_Credits_Issued_calc"],
+        mode="lines+markers",
+        name="Total Credits Issued",
+        marker=dict(size=8, color="#667eea"),
+        line=dict(width=2, color="#667eea"),
+        hovertemplate="%{x}<br>Total Issued: %{y:,}<extra></extra>"
+    ))
+
+    # Update layout for stacked bars
+    fig_cr.update_layout(
+        barmode="stack",
+        margin=dict(t=55, r=10, b=30, l=10),
+        xaxis_title="Reduction / Removal",
+        yaxis_title="Credits",
+        legend_title_text="Category",
+        xaxis=dict(tickangle=0, automargin=True)
+    )
+    return fig_cr
+
+
+def redrem_registry_bar(projects_by_redrem_by_std):
+    # Plotly stacked bar
+    df_plot = projects_by_redrem_by_std.copy()
+    df_plot["Voluntary_Registry_wrapped"] = df_plot["Voluntary_Registry"].apply(lambda s: wrap_with_br(s, 14))
+
+    fig_ct = px.bar(
+        df_plot,
+        x="Voluntary_Registry_wrapped",
+        y="Counts",
+        color="Reduction_Removal",
+        barmode="stack",
+        text="Counts",
+        # title="Projects by Reduction/Removal per Registry",
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+    fig_ct.update_traces(
+        texttemplate="%{text:,}",
+        hovertemplate="%{x}<br>%{legendgroup}: %{y:,}<extra></extra>",
+        cliponaxis=False,
+    )
+    fig_ct.update_layout(
+        margin=dict(t=55, r=10, b=40, l=10),
+        xaxis_title="Voluntary Registry",
+        yaxis_title="Number of Projects",
+    )
+    fig_ct.update_xaxes(tickangle=0, automargin=True)
+    return fig_ct
+
+
+def scope_sunburst(scope_type, type_col="Type"):
+    fig_sb = px.sunburst(
+        scope_type,
+        path=["Scope", type_col],
+        values="Counts",
+        hover_data={"Counts": True},
+        width=500, height=500,
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+
+    fig_sb.update_layout(
+        margin=dict(t=40, r=10, b=40, l=10)
+    )
+
+    fig_sb.update_traces(textfont_size=12)
+    return fig_sb
+
+
+def registry_sunburst(reg_scope_type, type_col="Type"):
+    fig_sb2 = px.sunburst(
+        reg_scope_type,
+        path=["Voluntary_Registry", "Scope", type_col],
+        values="Counts",
+        hover_data={"Counts": True},
+        width=500, height=500,
+        color_discrete_sequence=px.colors.qualitative.Set2
+    )
+
+    fig_sb2.update_layout(
+        margin=dict(t=40, r=10, b=40, l=10)
+    )
+
+    fig_sb2.update_traces(textfont_size=12)
+    return fig_sb2
+
+
+def country_map(mapping):
+    # Build full map
+    fig_map = px.choropleth(
+        data_frame=mapping,
+        locations="Country",
+        locationmode="country names",
+        color="Counts",
+        hover_name="Country",
+        color_continuous_scale="Viridis",
+        custom_data=["Country"],
+    )
+
+    fig_map.update_layout(
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        font=dict(color="white"),
+        margin=dict(t=40, r=10, b=40, l=10),
+        geo=dict(bgcolor="rgba(0,0,0,0)", showframe=False, showcoastlines=False, showland=False, showocean=False, showcountries=False)
+    )
+    fig_map.update_geos(fitbounds="locations", visible=False, bgcolor="rgba(0,0,0,0)")
+    fig_map.update_traces(marker_opacity=0.7, marker_line_width=0)
+    return fig_map
+
+
+def registry_maps(four_blocks):
+    # Which registry columns to plot
+    desired = list(MAP_REGISTRIES)
+    available = [c for c in desired if c in four_blocks.columns]
+    if len(available) < 4:
+        # Try common alternates
+        for short, alts in MAP_REGISTRIES.items():
+            if short not in available:
+                for alt in alts:
+                    if alt in four_blocks.columns:
+                        four_blocks[short] = four_blocks[alt]
+                        available.append(short)
+                        break
+        available = [c for c in desired if c in set(available)]
+
+    # Helper to build one choropleth
+    def make_map(df, value_col, title):
+        fig = px.choropleth(
+            data_frame=df,
+            locations="Country",
+            locationmode="country names",
+            color=value_col,
+            hover_name="Country",
+            title=title,
+            projection="mercator",
+            color_continuous_scale="Viridis",
+        )
+        fig.update_layout(
+            margin=dict(t=20, r=10, b=5, l=10),
+        )
+        fig.update_geos(fitbounds="locations", visible=False, bgcolor="rgba(0,0,0,0)")
+        return fig
+
+    # Build figures (up to 4)
+    figs = []
+    titles = {
+        "VCS": "VCS projects in every country",
+        "GOLD": "GOLD projects in every country",
+        "ACR": "ACR projects in every country",
+        "CAR": "CAR projects in every country",
+    }
+    for col in available:
+        figs.append(make_map(four_blocks, col, titles.get(col, f"{col} projects in every country")))
+    return figs
+
+
+def vintage_lines(pivot_vintage):
+    # Line chart
+    pivot_reset = pivot_vintage.reset_index().melt(
+        id_vars="First_Vintage_Year",
+        var_name="Registry",
+        value_name="Counts",
+    )
+
+    fig_vintage = px.line(
+        pivot_reset,
+        x="First_Vintage_Year",
+        y="Counts",
+        color="Registry",
+        markers=True,
+        color_discrete_sequence=px.colors.qualitative.Set1
+    )
+
+    fig_vintage.update_layout(
+        margin=dict(t=50, r=10, b=40, l=10),
+        xaxis=dict(title="First Vintage Year", tickformat="%Y"),
+        yaxis=dict(title="Number of Projects"),
+    )
+
+    fig_vintage.update_xaxes(range=[pivot_vintage.index.min(), pivot_vintage.index.max()])
+    return fig_vintage
+
+
+def vintage_credit_lines(credits_by_vintage):
+    # One line per vintage sheet (issued, retired) over the vintage years
+    long = credits_by_vintage.reset_index().melt(id_vars="Vintage", var_name="Credits", value_name="Amount")
+    long["Credits"] = long["Credits"].str.replace("Credits_", "", regex=False)
+
+    fig = px.line(
+        long,
+        x="Vintage",
+        y="Amount",
+        color="Credits",
+        markers=True,
+        color_discrete_sequence=px.colors.qualitative.Set2,
+    )
+    fig.update_layout(
+        margin=dict(t=50, r=10, b=40, l=10),
+        xaxis=dict(title="Vintage Year", dtick=1),
+        yaxis=dict(title="Credits"),
+    )
+    return fig
+
+
+def top_countries_bar(top):
+    # The top countries by projects in the expected registries (and everyone
+    # else as one bar), most first, as top_countries() ranks them
+    desired = list(TOP_REGISTRIES)
+
+    # Horizontal stacked bar
+    fig_top10 = px.bar(
+        top,
+        x="Country",
+        y=desired,
+        orientation="v",
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+    fig_top10.update_layout(
+        barmode="stack",
+        margin=dict(t=40, r=10, b=10, l=10),
+        xaxis_title="Country",
+        yaxis_title="Number of Projects",
+    )
+    return fig_top10
+
+
+# section aggregate -> figure builder
+FIGURES = {
+    "registry_counts": registry_bar,
+    "redrem_counts": redrem_bar,
+    "credits_by_redrem": credits_chart,
+    "redrem_by_registry": redrem_registry_bar,
+    "scope_type": scope_sunburst,
+    "registry_scope_type": registry_sunburst,
+    "country_counts": country_map,
+    "country_by_registry": registry_maps,
+    "vintage_by_registry": vintage_lines,
+    "registry_by_country": top_countries_bar,
+}
+
+
+# ============== SERIALIZED FIGURES ==============
+def dump_figure(fig):
+    if isinstance(fig, list):
+        return [f.to_json() for f in fig]
+    return fig.to_json()
+
+
+def load_figure(payload):
+    if isinstance(payload, list):
+        return [load_figure(p) for p in payload]
+    # Already validated when it was built; validating again would also coerce
+    # numeric text labels to strings
+    return go.Figure(json.loads(payload), _validate=False)
+
+
+def warm_up(dataset):
+    """Build and serialize every figure of the unfiltered view into
+    dataset.figures, so the first paint only deserializes them."""
+    if dataset.figures:
+        log.info("Default view of %s already warm (%d precomputed figures)", dataset.release, len(dataset.figures))
+        return dataset
+    t0 = time.perf_counter()
+    figures = {}
+    for name, build in FIGURES.items():
+        table = dataset.aggregates.get(name)
+        if table is None or table.empty:
+            continue
+        figures[name] = dump_figure(build(table.copy()))
+    dataset.figures = figures
+    log.info("Warmed default view of %s (%d figures) in %.2fs",
+             dataset.release, len(figures), time.perf_counter() - t0)
+    return dataset
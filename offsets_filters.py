@@ -0,0 +1,448 @@
+# -*- coding: utf-8 -*-
+"""
+Sidebar filtering: a bitmap index over the filter columns (one packed bitmap
+per (column, value), built once per dataset), sorted indexes for numeric
+ranges, cascading option lookups, a copy-free filtered view, a
+process-wide memo of filtered results and the URL encoding of a filter state.
+"""
+
+import logging
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+
+def _codes(s):
+    # Integer codes and their labels; categoricals already carry both
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s.cat.codes.to_numpy(), s.cat.categories
+    return pd.factorize(s, use_na_sentinel=True)
+
+
+class BitmapIndex:
+    """Bitmaps of `cols` in `df`, 64 rows per uint64 word."""
+
+    def __init__(self, df, cols):
+        n_words = (len(df) + 63) // 64
+        parts = {}
+        for col in cols:
+            if col not in df.columns:
+                continue
+            codes, labels = _codes(df[col])
+            # Rows grouped by code, then one bitmap per label from its run of rows
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+            bits = np.zeros(n_words * 64, dtype=bool)
+            words = np.zeros((len(labels), n_words), dtype=np.uint64)
+            for k in range(len(labels)):
+                rows = order[bounds[k]:bounds[k + 1]]
+                bits[rows] = True
+                words[k] = np.packbits(bits, bitorder="little").view(np.uint64)
+                bits[rows] = False
+            parts[col] = (codes, labels.tolist(), words)
+        self._assemble(len(df), parts)
+
+    @classmethod
+    def from_parts(cls, n_rows, parts):
+        """Index over the arrays of parts() (e.g. memory-mapped artifacts)."""
+        index = cls.__new__(cls)
+        index._assemble(n_rows, parts)
+        return index
+
+    def _assemble(self, n_rows, parts):
+        self.n_rows = n_rows
+        self.n_words = (n_rows + 63) // 64
+        self.codes = {col: codes for col, (codes, _, _) in parts.items()}
+        self.labels = {col: list(labels) for col, (_, labels, _) in parts.items()}
+        self.words = {col: words for col, (_, _, words) in parts.items()}
+        # Each label's bitmap is a row of its column's words
+        self.bitmaps = {col: dict(zip(self.labels[col], self.words[col])) for col in parts}
+        self._empty = np.zeros(self.n_words, dtype=np.uint64)
+
+    def parts(self):
+        """{column: (codes, labels, words)}, labels x words bitmaps per column."""
+        return {col: (self.codes[col], self.labels[col], self.words[col]) for col in self.codes}
+
+    @property
+    def nbytes(self):
+        return sum(len(values) for values in self.bitmaps.values()) * self.n_words * 8
+
+    def column_bitmap(self, col, values):
+        """OR of the bitmaps of `values` in `col`; unknown values match nothing."""
+        index = self.bitmaps[col]
+        out = self._empty.copy()
+        for v in values:
+            bm = index.get(v)
+            if bm is not None:
+                out |= bm
+        return out
+
+    def bitmap(self, selections, masks=()):
+        """Bitmap of the rows matching every non-empty selection
+        ({column: values}, OR within a column, AND across columns) and every
+        bitmap in `masks`, or None when there is nothing to apply."""
+        out = None
+        for col, values in selections.items():
+            if not values or col not in self.bitmaps:
+                continue
+            bm = self.column_bitmap(col, values)
+            out = bm if out is None else out & bm
+        for bm in masks:
+            out = bm if out is None else out & bm
+        return out
+
+    def bits(self, bitmap):
+        return np.unpackbits(bitmap.view(np.uint8), count=self.n_rows, bitorder="little").view(bool)
+
+    def positions(self, bitmap):
+        return np.flatnonzero(self.bits(bitmap))
+
+    def facet_counts(self, selections, masks=()):
+        """How many rows each value of each column would match under every
+        other active filter: {column: {value: count}}.
+
+        One pass: a row counts towards a column's facets when it passes all
+        filters, or fails only that column's; the codes of every column are
+        offset into one bincount.
+        """
+        active = [col for col, values in selections.items() if values and col in self.bitmaps]
+        checks = [self.bits(self.column_bitmap(col, selections[col])) for col in active]
+        checks += [self.bits(bm) for bm in masks]
+        keep_all = near_miss = None
+        if checks:
+            passed = np.stack(checks)
+            fails = len(checks) - passed.sum(axis=0, dtype=np.int16)
+            keep_all = fails == 0
+            near_miss = np.where(fails == 1, np.argmin(passed, axis=0), -1)
+
+        pieces, spans, offset = [], {}, 0
+        for col, codes in self.codes.items():
+            if keep_all is None:
+                picked = codes
+            elif col in active:
+                picked = codes[keep_all | (near_miss == active.index(col))]
+            else:
+                picked = codes[keep_all]
+            pieces.append(picked[picked >= 0].astype(np.intp) + offset)
+            spans[col] = offset
+            offset += len(self.labels[col])
+        counts = np.bincount(np.concatenate(pieces), minlength=offset).tolist()
+        return {
+            col: dict(zip(self.labels[col], counts[start:start + len(self.labels[col])]))
+            for col, start in spans.items()
+        }
+
+    def select(self, selections, masks=()):
+        """Row positions matching `selections` and `masks`, or None for all rows."""
+        bm = self.bitmap(selections, masks)
+        return None if bm is None else self.positions(bm)
+
+
+class SortedIndex:
+    """Row order of each numeric column (missing values left out), so a
+    value range is two binary searches and a slice of rows."""
+
+    def __init__(self, df, cols):
+        self.n_rows = len(df)
+        self.n_words = (self.n_rows + 63) // 64
+        self.order = {}
+        self.values = {}
+        for col in cols:
+            if col not in df.columns:
+                continue
+            s = df[col]
+            present = np.flatnonzero(s.notna().to_numpy())
+            values = s.to_numpy(dtype="int64", na_value=0)[present]
+            by_value = np.argsort(values, kind="stable")
+            self.order[col] = present[by_value].astype(np.int32)
+            self.values[col] = values[by_value]
+
+    @classmethod
+    def from_parts(cls, n_rows, parts):
+        """Index over the arrays of parts() (e.g. memory-mapped artifacts)."""
+        index = cls.__new__(cls)
+        index.n_rows = n_rows
+        index.n_words = (n_rows + 63) // 64
+        index.order = {col: order for col, (order, _) in parts.items()}
+        index.values = {col: values for col, (_, values) in parts.items()}
+        return index
+
+    def parts(self):
+        """{column: (row order, sorted values)}."""
+        return {col: (self.order[col], self.values[col]) for col in self.order}
+
+    def bounds(self, col):
+        values = self.values.get(col)
+        return (int(values[0]), int(values[-1])) if values is not None and len(values) else (0, 0)
+
+    def rows(self, col, lo, hi):
+        """Positions of the rows with lo <= col <= hi, in value order."""
+        values = self.values[col]
+        start = np.searchsorted(values, lo, side="left")
+        stop = np.searchsorted(values, hi, side="right")
+        return self.order[col][start:stop]
+
+    def bitmap(self, col, lo, hi):
+        # Same packed layout as BitmapIndex, so ranges AND into the filter bitmap
+        bits = np.zeros(self.n_words * 64, dtype=bool)
+        bits[self.rows(col, lo, hi)] = True
+        return np.packbits(bits, bitorder="little").view(np.uint64)
+
+
+def _label(v):
+    return v if pd.notna(v) else None
+
+
+class CascadeOptions:
+    """Dependent sidebar options as lookup tables over the distinct
+    Region/Country/Scope/Type combinations: Region -> Countries and
+    Scope -> Region -> Country -> Types. Options are set unions, so their
+    cost depends on the number of combinations, not on the row count."""
+
+    def __init__(self, cascade):
+        self.countries = {}
+        self.types = {}
+        cols = [c if c in cascade.columns else None for c in ["Region", "Country", "Scope", "Type"]]
+        columns = [cascade[c].tolist() if c else [None] * len(cascade) for c in cols]
+        for region, country, scope, type_ in zip(*columns):
+            region, country, scope, type_ = map(_label, (region, country, scope, type_))
+            if country is not None:
+                self.countries.setdefault(region, set()).add(country)
+            if type_ is not None:
+                (self.types.setdefault(scope, {}).setdefault(region, {})
+                 .setdefault(country, set()).add(type_))
+
+    def country_options(self, regions):
+        """Countries found in any of `regions`."""
+        return sorted(set().union(*(self.countries.get(r, ()) for r in regions)))
+
+    def type_options(self, scopes, regions=(), countries=()):
+        """Types found with any of `scopes`, narrowed to `regions` and
+        `countries` when those are selected."""
+        out = set()
+        for scope in scopes:
+            by_region = self.types.get(scope, {})
+            for region in (regions or list(by_region)):
+                by_country = by_region.get(region, {})
+                for country in (countries or list(by_country)):
+                    out |= by_country.get(country, set())
+        return sorted(out)
+
+
+class FilteredView:
+    """A row selection over a base frame that copies nothing up front.
+    Columns are gathered on demand and only for the selected rows; `rows`
+    None means every row, served straight from the base frame."""
+
+    def __init__(self, df, rows=None):
+        self.df = df
+        self.rows = rows
+
+    @property
+    def columns(self):
+        return self.df.columns
+
+    def __len__(self):
+        return len(self.df) if self.rows is None else len(self.rows)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    def __getitem__(self, col):
+        s = self.df[col]
+        return s if self.rows is None else s.iloc[self.rows]
+
+    def frame(self, cols):
+        """Just `cols` of the selected rows; unfiltered, it shares the base buffers."""
+        return pd.DataFrame({c: self[c] for c in cols}, copy=False)
+
+
+# ============== FILTER MEMO ==============
+def filter_key(version, selections, country_filter=(), ranges=None):
+    """Canonical filter state: order of columns and of picked values, and
+    empty selections, don't matter."""
+    picked = tuple(
+        (col, tuple(sorted(set(values)))) for col, values in sorted(selections.items()) if values
+    )
+    spans = tuple((col, int(lo), int(hi)) for col, (lo, hi) in sorted((ranges or {}).items()))
+    return version, picked, tuple(sorted(set(country_filter or ()))), spans
+
+
+def _nbytes(obj):
+    if obj is None:
+        return 0
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(np.sum(obj.memory_usage(index=True, deep=True)))
+    return sys.getsizeof(obj)
+
+
+class FilterMemo:
+    """Process-wide LRU of filtered results, shared by every session: the
+    row selection of a filter state and each aggregate computed from it.
+    Bounded by the memory of what it holds; least recently used states go
+    first. Callers must not modify the tables they get back."""
+
+    def __init__(self, max_bytes=256 * 2**20, report_every=200):
+        self.max_bytes = max_bytes
+        self.report_every = report_every
+        self.hits = self.misses = self.evictions = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()  # key -> {"rows", "tables", "nbytes"}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key, name, build):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if name in entry["tables"]:
+                    self.hits += 1
+                    self._maybe_report()
+                    return entry["tables"][name]
+            self.misses += 1
+            self._maybe_report()
+        value = build()
+        with self._lock:
+            entry = self._entries.setdefault(key, {"tables": {}, "nbytes": 0})
+            self._entries.move_to_end(key)
+            if name not in entry["tables"]:
+                entry["tables"][name] = value
+                size = _nbytes(value)
+                entry["nbytes"] += size
+                self.nbytes += size
+                self._evict(keep=key)
+            return entry["tables"][name]
+
+    def rows(self, key, build):
+        """Row positions of the filter state `key`; build() on a miss."""
+        return self._lookup(key, "__rows__", build)
+
+    def table(self, key, name, build):
+        """Aggregate `name` of the filter state `key`; build() on a miss."""
+        return self._lookup(key, name, build)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def _evict(self, keep):
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            if key == keep:
+                self._entries.move_to_end(key)
+                continue
+            self.nbytes -= self._entries.pop(key)["nbytes"]
+            self.evictions += 1
+
+    def _maybe_report(self):
+        if self.report_every and (self.hits + self.misses) % self.report_every == 0:
+            log.info("Filter memo: %s", self.stats())
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "states": len(self._entries),
+            "evictions": self.evictions,
+            "mb": round(self.nbytes / 2**20, 2),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+
+# ============== SHAREABLE LINKS ==============
+# Query parameter of each filter column; a multiselect's values are joined by
+# LINK_SEP (escaped with a backslash inside a value), a range is "lo~hi"
+LINK_PARAMS = {
+    "Region": "region", "Country": "country", "Voluntary_Registry": "registry",
+    "Scope": "scope", "Type": "type", "Reduction_Removal": "rr",
+    "Total_Credits_Issued": "issued", "Total_Credits_Retired": "retired",
+    "Total_Credits_Remaining": "remaining", "Total_Buffer_Pool_Deposits": "buffer",
+    "First_Vintage_Year": "vintage",
+}
+LINK_SEP = "|"
+
+
+def _join_link(values):
+    return LINK_SEP.join(
+        v.replace("\\", "\\\\").replace(LINK_SEP, "\\" + LINK_SEP) for v in sorted(set(values))
+    )
+
+
+def _split_link(raw):
+    values, value, chars = [], [], iter(raw)
+    for c in chars:
+        if c == "\\":
+            value.append(next(chars, ""))
+        elif c == LINK_SEP:
+            values.append("".join(value))
+            value = []
+        else:
+            value.append(c)
+    values.append("".join(value))
+    return values
+
+
+def encode_link(selections, country_filter=(), ranges=None, search=""):
+    """Query params of a filter state. Canonical like filter_key, so equal
+    states always give the same link."""
+    params = {}
+    for col, values in sorted(selections.items()):
+        if values and col in LINK_PARAMS:
+            params[LINK_PARAMS[col]] = _join_link(values)
+    for col, (lo, hi) in sorted((ranges or {}).items()):
+        if col in LINK_PARAMS:
+            params[LINK_PARAMS[col]] = f"{int(lo)}~{int(hi)}"
+    if country_filter:
+        params["map"] = _join_link(country_filter)
+    if search and search.strip():
+        params["q"] = search.strip()
+    return params
+
+
+def decode_link(params, options, bounds, countries=()):
+    """Filter state of the query params of a link:
+    (selections, country_filter, ranges, search).
+
+    Values not in `options` ({column: values}) and map countries not in
+    `countries` (display names) are dropped, and range ends (infinite ones
+    too) are clamped to `bounds(column)`, so stale or hand-edited links
+    still open. Only unparsable or inverted ranges are dropped.
+    """
+    selections, ranges = {}, {}
+    for col, name in LINK_PARAMS.items():
+        raw = params.get(name)
+        if not raw:
+            continue
+        if col in options:
+            valid = set(options[col])
+            picked = [v for v in _split_link(raw) if v in valid]
+            if picked:
+                selections[col] = picked
+            continue
+        lo_b, hi_b = bounds(col)
+        try:
+            lo, hi = (float(x) for x in raw.split("~", 1))
+        except ValueError:
+            continue
+        if not lo <= hi:  # inverted, or NaN
+            continue
+        lo, hi = (int(min(max(x, lo_b), hi_b)) for x in (lo, hi))
+        if (lo, hi) != (lo_b, hi_b):
+            ranges[col] = (lo, hi)
+    valid = set(countries)
+    country_filter = [v for v in _split_link(params.get("map") or "") if v in valid]
+    return selections, country_filter, ranges, (params.get("q") or "").strip()
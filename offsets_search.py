@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Trigram index over Project ID and Project Name for the projects table search:
+substring (and so prefix) matches from posting-list intersections, and
+typo-tolerant matches ranked by shared trigrams when nothing matches exactly.
+"""
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+SEARCH_COLS = ["Project ID", "Project Name"]
+
+
+def _trigrams(data):
+    # uint8 bytes -> 24-bit trigram codes, one per starting byte
+    d = data.astype(np.uint32)
+    return (d[:-2] << 16) | (d[1:-1] << 8) | d[2:]
+
+
+class TrigramIndex:
+    """Lower-cased UTF-8 trigrams of the searchable columns of each row.
+
+    Postings are one (trigram, row) array sorted by trigram then row, so a
+    trigram's rows are a binary-searched slice, already in row order.
+    """
+
+    # Trigrams of the query one typo can break: a substitution or deletion
+    # breaks up to three, an insertion two, and swapping two adjacent
+    # characters (the commonest typo) up to four
+    TYPO_TRIGRAMS = 4
+    # Close matches shown at most, best first
+    FUZZY_LIMIT = 50
+
+    def __init__(self, df, cols=SEARCH_COLS):
+        cols = [c for c in cols if c in df.columns]
+        self.n_rows = len(df)
+        parts = []
+        for c in cols:
+            arr = pa.array(df[c], from_pandas=True)
+            if isinstance(arr, pa.ChunkedArray):
+                arr = arr.combine_chunks()
+            parts.append(pc.fill_null(pc.utf8_lower(arr.cast(pa.string())), ""))
+        if not parts:
+            self.texts = pa.array([""] * self.n_rows)
+        elif len(parts) == 1:
+            self.texts = parts[0]
+        else:
+            # "\x00" never occurs in a query, so matches can't span columns
+            self.texts = pc.binary_join_element_wise(*parts, "\x00")
+
+        offsets = np.frombuffer(self.texts.buffers()[1], dtype=np.int32)[
+            self.texts.offset:self.texts.offset + self.n_rows + 1
+        ]
+        data = np.frombuffer(self.texts.buffers()[2], dtype=np.uint8)[offsets[0]:offsets[-1]]
+        row_of = np.repeat(np.arange(self.n_rows, dtype=np.int64), np.diff(offsets))
+
+        if len(data) >= 3:
+            inside = (row_of[:-2] == row_of[2:]) & (data[:-2] != 0) & (data[1:-1] != 0) & (data[2:] != 0)
+            pairs = np.unique((_trigrams(data)[inside].astype(np.int64) << 32) | row_of[:-2][inside])
+        else:
+            pairs = np.zeros(0, dtype=np.int64)
+        self.grams = (pairs >> 32).astype(np.uint32)
+        self.rows = (pairs & 0xFFFFFFFF).astype(np.int32)
+
+    @classmethod
+    def from_parts(cls, n_rows, texts, grams, rows):
+        """Index over the arrays of parts() (e.g. memory-mapped artifacts)."""
+        index = cls.__new__(cls)
+        index.n_rows = n_rows
+        index.texts, index.grams, index.rows = texts, grams, rows
+        return index
+
+    def parts(self):
+        """(texts, grams, rows): the searched texts (Arrow) and the postings."""
+        return self.texts, self.grams, self.rows
+
+    @property
+    def nbytes(self):
+        return self.grams.nbytes + self.rows.nbytes + self.texts.nbytes
+
+    # Stop intersecting once this few candidates are left; verifying them is cheaper
+    VERIFY_BELOW = 256
+
+    def postings(self, gram):
+        # Keys in the haystack's dtype, or numpy casts the whole array per call
+        lo, hi = np.searchsorted(self.grams, np.array([gram, gram + 1], dtype=self.grams.dtype))
+        return self.rows[lo:hi]
+
+    @staticmethod
+    def _within(cands, sorted_rows):
+        # cands that occur in sorted_rows, by binary search (no sort of either)
+        pos = np.searchsorted(sorted_rows, cands)
+        found = pos < len(sorted_rows)
+        found[found] = sorted_rows[pos[found]] == cands[found]
+        return cands[found]
+
+    def _contains(self, rows, query):
+        # Verify candidates (or scan `rows`, None = all) for the literal substring
+        texts = self.texts if rows is None else self.texts.take(pa.array(rows, type=pa.int32()))
+        hit = pc.match_substring(texts, query).to_numpy(zero_copy_only=False)
+        return np.flatnonzero(hit) if rows is None else rows[hit]
+
+    def search(self, query, rows=None):
+        """Rows matching `query`, restricted to `rows` (sorted positions, e.g.
+        the current filter selection; None = all rows).
+
+        Returns (positions, mode): "substring" hits in row order, or when
+        there are none, up to FUZZY_LIMIT "fuzzy" hits ranked by shared
+        trigrams.
+        """
+        query = query.strip().lower()
+        if not query:
+            return (np.arange(self.n_rows) if rows is None else rows), "all"
+        qbytes = np.frombuffer(query.encode("utf-8"), dtype=np.uint8)
+        if rows is not None:
+            rows = np.asarray(rows, dtype=self.rows.dtype)
+        if len(qbytes) < 3:
+            return self._contains(rows, query), "substring"
+
+        grams = np.unique(_trigrams(qbytes))
+        lists = sorted((self.postings(g) for g in grams), key=len)
+        # Rarest posting list first, then probe the others (and the filter rows)
+        cands = lists[0]
+        if rows is not None:
+            cands = self._within(cands, rows) if len(cands) <= len(rows) else self._within(rows, cands)
+        for other in lists[1:]:
+            if len(cands) <= self.VERIFY_BELOW:
+                break
+            cands = self._within(cands, other)
+        exact = self._contains(cands, query) if len(cands) else cands
+        if len(exact):
+            return exact, "substring"
+
+        # Typo-tolerant: rows sharing all but the trigrams one edit can break,
+        # and never fewer than half of them (short queries would match anything)
+        need = max(-(-len(grams) // 2), len(grams) - self.TYPO_TRIGRAMS)
+        counts = np.bincount(np.concatenate(lists), minlength=self.n_rows)
+        if rows is not None:
+            found = rows[counts[rows] >= need]
+        else:
+            found = np.flatnonzero(counts >= need)
+        return found[np.argsort(-counts[found], kind="stable")][:self.FUZZY_LIMIT], "fuzzy"
@@ -6,17 +6,17 @@ Created on Mon Sep  1 16:10:41 2025
 """
 
 import streamlit as st
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import os
-import textwrap
-import plotly.express as px
-import pycountry
-import plotly.io as pio
-import plotly.graph_objects as go
 from streamlit_plotly_events import plotly_events
-import textwrap
+import logging
+import time
+
+from offsets_aggregates import TOP_K_CHOICES, LazyGraph, credits_by_vintage, planned_grain, sections_of
+from offsets_data import EXCEL_PATH, SHEET_NAME, SKIP_ROWS, DatasetStore, ReleaseHistory
+from offsets_figures import FIGURES, load_figure, vintage_credit_lines, warm_up
+from offsets_filters import FilterMemo, FilteredView, decode_link, encode_link, filter_key
 
 # ============== CONFIG ==============
 st.set_page_config(
@@ -247,102 +247,189 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-EXCEL_PATH = r"data/Voluntary-Registry-Offsets-Database--v2025-06.xlsx"
-SHEET_NAME = "PROJECTS"
-SKIP_ROWS = 3
+RELOAD_POLL_SECONDS = 30  # how often the workbook (or a newer release next to it) is checked
+HISTORY_DIR = os.path.join(os.path.dirname(EXCEL_PATH), "history")  # every release seen, for diffs
+FILTER_MEMO_MB = 256  # memory budget of filtered results shared across sessions
+FILTER_DEBOUNCE_SECONDS = 1.5  # sidebar stillness before filter edits are applied automatically
 
 # ============== BACKGROUND SETTING ==============
-ST_BG = "#0e1117"
-
-# Define a global template that matches Streamlit dark
-pio.templates["st_dark"] = go.layout.Template(
-    layout=go.Layout(
-        paper_bgcolor=ST_BG,
-        plot_bgcolor=ST_BG,
-        font=dict(color="white", family="Plus Jakarta Sans"),
-        margin=dict(t=20, r=10, b=40, l=10),
-        xaxis=dict(tickfont=dict(color="white"), titlefont=dict(color="white")),
-        yaxis=dict(tickfont=dict(color="white"), titlefont=dict(color="white")),
-        legend=dict(font=dict(color="white")),
-        coloraxis=dict(
-            colorbar=dict(
-                tickfont=dict(color="white"),
-                titlefont=dict(color="white"),
-            )
-        ),
-    )
-)
-
-pio.templates.default = "st_dark"
+# The "st_dark" plotly template is registered (and made default) by offsets_figures
 
 # ============== HELPERS ==============
-@st.cache_data(show_spinner=False)
-def load_projects(path, sheet_name, skip_rows):
-    df = pd.read_excel(path, sheet_name=sheet_name, skiprows=skip_rows)
-
-    # Normalize column names: strip, collapse spaces, replace \n, unify separators
-    def fix_col(c):
-        c = str(c).replace("\n", " ").strip()
-        c = " ".join(c.split())  # collapse repeated spaces
-        return c
-
-    df.columns = [fix_col(c) for c in df.columns]
-
-    # Friendly renames (after normalization)
-    ren = {
-        "Voluntary Registry": "Voluntary_Registry",
-        "Voluntary Status": "Voluntary_Status",
-        "Type": "Type",
-        "Total Credits Issued": "Total_Credits_Issued",
-        "Total Credits Retired": "Total_Credits_Retired",
-        "Total Credits Remaining": "Total_Credits_Remaining",
-        "Total Buffer Pool Deposits": "Total_Buffer_Pool_Deposits",
-        "Reversals Covered by Buffer Pool": "Reversals_Covered_by_Buffer",
-        "Reversals Not Covered by Buffer": "Reversals_Not_Covered_by_Buffer",
-        "Buffer Credits Released to Project": "Buffer_Credits_Released",
-        "ARB / WA Project": "ARB_WA_Project",
-        "First Year of Project (Vintage)": "First_Vintage_Year",
-        "Methodology / Protocol": "Methodology_Protocol",
-        "Methodology Version": "Methodology_Version",
-        "Project Site Location": "Project_Site_Location",
-        "Project Developer": "Project_Developer",
-        "Reduction / Removal": "Reduction_Removal",
-    }
-    df = df.rename(columns={k: v for k, v in ren.items() if k in df.columns})
-
-    # Keep only columns we need
-    wanted = [
-        "Project ID", "Project Name", "Voluntary_Registry", "ARB_WA_Project", "Voluntary_Status",
-        "Scope", "Type", "Reduction_Removal", "Methodology_Protocol", "Methodology_Version",
-        "Region", "Country", "State", "Project_Site_Location", "Project_Developer",
-        "Total_Credits_Issued", "Total_Credits_Retired", "Total_Credits_Remaining",
-        "Total_Buffer_Pool_Deposits", "Reversals_Covered_by_Buffer", "Reversals_Not_Covered_by_Buffer",
-        "Buffer_Credits_Released", "First_Vintage_Year"
-    ]
-    existing = [c for c in wanted if c in df.columns]
-    df = df[existing].copy()
-
-    # Basic cleaning
-    df = df[df["Project ID"].notna()]
-    
-    # Coerce numeric credit cols
-    numeric_cols = [
-        "Total_Credits_Issued", "Total_Credits_Retired", "Total_Credits_Remaining",
-        "Total_Buffer_Pool_Deposits", "Reversals_Covered_by_Buffer", "Reversals_Not_Covered_by_Buffer",
-        "Buffer_Credits_Released"
-    ]
-    for c in numeric_cols:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
-
-    # Fill category NAs
-    for c in ["Voluntary_Registry", "Scope", "Type", "Reduction_Removal", "Region", "Country"]:
-        if c in df.columns:
-            df[c] = df[c].fillna("Unknown")
-
-    return df
+# Data-layer messages (loads, swaps, warm-up timing) go to the server log
+logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+for name in ("offsets_data", "offsets_figures", "offsets_filters", "offsets_aggregates"):
+    logging.getLogger(name).setLevel(logging.INFO)
+
+@st.cache_resource(show_spinner=False)
+def release_history(root):
+    return ReleaseHistory(root)
+
+@st.cache_resource(show_spinner=False)
+def dataset_store(path, sheet_name, skip_rows):
+    # One store per server process; it watches the workbook and hot-swaps releases.
+    # Each release is warmed (figures of the unfiltered view) before it is published
+    t0 = time.perf_counter()
+    store = DatasetStore(path, sheet_name, skip_rows, poll_seconds=RELOAD_POLL_SECONDS, prepare=warm_up)
+
+    # Every release this server sees goes into the history once, with its
+    # diffs from the earlier releases computed before anyone asks
+    history = release_history(HISTORY_DIR)
+
+    def record(dataset):
+        history.ingest(dataset.release, dataset.df, dataset.version)
+        history.prepare_diffs(dataset.release)
+
+    record(store.current)
+    store.on_swap(lambda old, new: record(new))
+    logging.getLogger("offsets_figures").info(
+        "Server warm-up of %s finished in %.2fs", store.current.release, time.perf_counter() - t0
+    )
+    return store
+
+@st.cache_resource(show_spinner=False)
+def filter_memo():
+    # Row selections and aggregates per filter state, shared by all sessions
+    memo = FilterMemo(max_bytes=FILTER_MEMO_MB * 2**20)
+    dataset_store(EXCEL_PATH, SHEET_NAME, SKIP_ROWS).on_swap(lambda old, new: memo.clear())
+    return memo
+
+# Take the current release once; the whole rerun works on this snapshot
+dataset = dataset_store(EXCEL_PATH, SHEET_NAME, SKIP_ROWS).current
+df_projects = dataset.df
+history = release_history(HISTORY_DIR)
+
+FILTER_KEYS = {
+    "region_sel": "Region", "country_sel": "Country", "registry_sel": "Voluntary_Registry",
+    "scope_sel": "Scope", "type_sel": "Type", "redrem_sel": "Reduction_Removal",
+}
+# Range sliders: session key -> (column, label)
+RANGE_KEYS = {
+    "issued_range": ("Total_Credits_Issued", "Credits Issued"),
+    "retired_range": ("Total_Credits_Retired", "Credits Retired"),
+    "remaining_range": ("Total_Credits_Remaining", "Credits Remaining"),
+    "buffer_range": ("Total_Buffer_Pool_Deposits", "Buffer Pool Deposits"),
+    "vintage_range": ("First_Vintage_Year", "First Vintage Year"),
+}
+if st.session_state.get("dataset_version", dataset.version) != dataset.version:
+    # New release while this session was open: drop selections that no longer exist
+    for key, col in FILTER_KEYS.items():
+        if key in st.session_state:
+            valid = set(dataset.options.get(col, []))
+            st.session_state[key] = [v for v in st.session_state[key] if v in valid]
+    for key in RANGE_KEYS:
+        st.session_state.pop(key, None)  # slider bounds come from the release
+    st.session_state["apply_filters"] = True
+    st.toast(f"Loaded database release {dataset.release}")
+st.session_state["dataset_version"] = dataset.version
+
+# ============== SHARED LINKS ==============
+# A link carries the filter state in its query params; a new session restores
+# it into the widget keys before any widget is drawn, so it opens in one pass
+if "link_restored" not in st.session_state:
+    st.session_state["link_restored"] = True
+    link_sel, link_countries, link_ranges, link_search = decode_link(
+        st.query_params.to_dict(), dataset.options, dataset.ranges.bounds, dataset.country_names.values()
+    )
+    cascade = dataset.cascade_options
+    if link_sel.get("Region") and link_sel.get("Country"):
+        valid = set(cascade.country_options(link_sel["Region"]))
+        link_sel["Country"] = [c for c in link_sel["Country"] if c in valid]
+    if link_sel.get("Scope") and link_sel.get("Type"):
+        valid = set(cascade.type_options(link_sel["Scope"], link_sel.get("Region", []), link_sel.get("Country", [])))
+        link_sel["Type"] = [t for t in link_sel["Type"] if t in valid]
+    for key, col in FILTER_KEYS.items():
+        if link_sel.get(col):
+            st.session_state[key] = link_sel[col]
+    for key, (col, _) in RANGE_KEYS.items():
+        if col in link_ranges:
+            st.session_state[key] = link_ranges[col]
+    if link_countries:
+        st.session_state["country_filter"] = link_countries
+    if link_search:
+        st.session_state["project_search"] = link_search
+    if link_sel or link_ranges or link_countries:
+        # Same canonical key as any session that applied these filters before
+        cached = filter_key(dataset.version, link_sel, link_countries, link_ranges) in filter_memo()
+        logging.getLogger("offsets_filters").info(
+            "Opened shared link %s (%s)", dict(st.query_params), "cached" if cached else "not cached"
+        )
 
-df_projects = load_projects(EXCEL_PATH, SHEET_NAME, SKIP_ROWS)
+# ============== FILTER STATE ==============
+# Sidebar edits are drafts in the widget keys and only redraw the sidebar; the
+# dashboard is drawn from the applied state, which takes all drafts in one go
+# on Apply (or, opted into, once the sidebar has been still for a pause)
+for k in ["region_sel","country_sel","registry_sel","scope_sel","type_sel","redrem_sel","country_filter"]:
+    st.session_state.setdefault(k, [])
+st.session_state.setdefault("auto_apply", False)
+# The browser drops fragment timers on every full run, and so does this flag
+st.session_state["apply_timer"] = False
+
+def filter_state():
+    """(selections, ranges) of the filter widgets' current values."""
+    selections = {col: list(st.session_state.get(key, [])) for key, col in FILTER_KEYS.items()}
+    # Slider ranges narrower than the column's bounds; each is a slice of a presorted index
+    ranges = {
+        col: tuple(st.session_state[key]) for key, (col, _) in RANGE_KEYS.items()
+        if key in st.session_state and tuple(st.session_state[key]) != dataset.ranges.bounds(col)
+    }
+    return selections, ranges
+
+def filters_pending():
+    applied_sel, applied_ranges = st.session_state["applied_filters"]
+    draft_sel, draft_ranges = filter_state()
+    return filter_key(dataset.version, draft_sel, (), draft_ranges) != filter_key(dataset.version, applied_sel, (), applied_ranges)
+
+def note_filter_edit():
+    # on_change of every filter widget
+    st.session_state["filters_edited_at"] = time.time()
+    st.session_state["filter_edits"] = st.session_state.get("filter_edits", 0) + 1
+
+def request_apply():
+    st.session_state["apply_filters"] = True
+    st.rerun(scope="app")
+
+@st.fragment(run_every=FILTER_DEBOUNCE_SECONDS)
+def apply_when_idle():
+    # Only scheduled while drafts are pending; the apply's full run ends it
+    edited = st.session_state.get("filters_edited_at", 0)
+    if time.time() - edited >= FILTER_DEBOUNCE_SECONDS:
+        request_apply()
+
+if "applied_filters" not in st.session_state or st.session_state.pop("apply_filters", False):
+    # Every edit since the last apply would have been a full rerun of its own
+    edits = st.session_state.pop("filter_edits", 0)
+    if edits > 1:
+        st.session_state["reruns_avoided"] = st.session_state.get("reruns_avoided", 0) + edits - 1
+        logging.getLogger("offsets_filters").info(
+            "Applied %d filter edits in one rerun (%d reruns avoided this session)",
+            edits, st.session_state["reruns_avoided"],
+        )
+    st.session_state["applied_filters"] = filter_state()
+
+selections, ranges = st.session_state["applied_filters"]
+memo = filter_memo()
+filters_active = any(selections.values()) or bool(ranges)
+
+def range_bitmaps(ranges):
+    return [dataset.ranges.bitmap(col, lo, hi) for col, (lo, hi) in ranges.items()]
+
+def keep_selection(key, options):
+    # Facet counts are part of the option labels, and so of the widget's
+    # identity: re-assigning the value carries it over when the labels change
+    valid = set(options)
+    st.session_state[key] = [v for v in st.session_state.get(key, []) if v in valid]
+
+if st.session_state.country_filter:
+    # A map country outside the applied filters isn't on the map to be clicked
+    # off again, and would leave every section empty: drop it
+    applied_rows = memo.rows(
+        filter_key(dataset.version, selections, (), ranges),
+        lambda: dataset.bitmaps.select(selections, range_bitmaps(ranges)),
+    )
+    on_map = df_projects["Country"] if applied_rows is None else df_projects["Country"].iloc[applied_rows]
+    on_map = set(on_map.dropna().map(dataset.country_names))
+    st.session_state.country_filter = [c for c in st.session_state.country_filter if c in on_map]
 
 # ============== SIDEBAR FILTERS ==============
 with st.sidebar:
@@ -354,788 +441,583 @@ with st.sidebar:
     </div>
     """, unsafe_allow_html=True)
 
-    def uniq_sorted(s):
-        return sorted(pd.Series(s).dropna().unique().tolist())
+    @st.fragment
+    def filter_panel():
+        # Facet counts follow the drafts: matches per option under the other filters
+        draft_sel, draft_ranges = filter_state()
+        facets = memo.table(
+            filter_key(dataset.version, draft_sel, (), draft_ranges), "facets",
+            lambda: dataset.bitmaps.facet_counts(draft_sel, range_bitmaps(draft_ranges)),
+        )
 
-    # Initialize session state
-    for k in ["region_sel","country_sel","registry_sel","scope_sel","type_sel","redrem_sel","country_filter"]:
-        if k == "country_filter":
-            st.session_state.setdefault(k, [])
-        else:
-            st.session_state.setdefault(k, [])
-
-    # Compute options
-    region_opts = uniq_sorted(df_projects["Region"]) if "Region" in df_projects else []
-    country_opts = uniq_sorted(df_projects["Country"]) if "Country" in df_projects else []
-    scope_opts = uniq_sorted(df_projects["Scope"]) if "Scope" in df_projects else []
-    type_opts = uniq_sorted(df_projects["Type"]) if "Type" in df_projects else []
-    registry_opts = uniq_sorted(df_projects["Voluntary_Registry"]) if "Voluntary_Registry" in df_projects else []
-    redrem_all = uniq_sorted(df_projects["Reduction_Removal"]) if "Reduction_Removal" in df_projects else []
-
-    # Dynamic filtering logic
-    df_temp = df_projects.copy()
-    
-    # Filter sections with custom styling
-    st.markdown('<div class="filter-section hidden">', unsafe_allow_html=True)
-    st.markdown("""
-    <style>
-    .filter-label {
-        text-transform: none !important;
-    }
-    </style>
-""", unsafe_allow_html=True)
-    
-    st.markdown('<p class="filter-label">📍 by Geography</p>', unsafe_allow_html=True)
-    
-    region_sel = st.multiselect("Region", options=region_opts, key="region_sel")
+        def facet_label(col):
+            counts = facets.get(col, {})
+            return lambda v: f"{v} ({counts.get(v, 0):,})"
+
+        # Compute options
+        region_opts = dataset.options.get("Region", [])
+        country_opts = dataset.options.get("Country", [])
+        scope_opts = dataset.options.get("Scope", [])
+        type_opts = dataset.options.get("Type", [])
+        registry_opts = dataset.options.get("Voluntary_Registry", [])
+        redrem_all = dataset.options.get("Reduction_Removal", [])
+
+        # Dependent options come from lookup tables built with the dataset
+        cascade = dataset.cascade_options
     
-    # Dynamic country filtering
-    if region_sel:
-        df_temp = df_temp[df_temp["Region"].isin(region_sel)]
-        country_opts = uniq_sorted(df_temp["Country"]) if "Country" in df_temp else []
+        # Filter sections with custom styling
+        st.markdown('<div class="filter-section hidden">', unsafe_allow_html=True)
+        st.markdown("""
+        <style>
+        .filter-label {
+            text-transform: none !important;
+        }
+        </style>
+    """, unsafe_allow_html=True)
     
-    country_sel = st.multiselect("Country", options=country_opts, key="country_sel")
-    st.markdown('</div>', unsafe_allow_html=True)
-
-    st.markdown('<div class="filter-section hidden">', unsafe_allow_html=True)
-    st.markdown('<p class="filter-label">🏭 by Project</p>', unsafe_allow_html=True)
+        st.markdown('<p class="filter-label">📍 by Geography</p>', unsafe_allow_html=True)
     
-    scope_sel = st.multiselect("Scope", options=scope_opts, key="scope_sel")
+        keep_selection("region_sel", region_opts)
+        region_sel = st.multiselect("Region", options=region_opts, format_func=facet_label("Region"), key="region_sel", on_change=note_filter_edit)
     
-    # Dynamic type filtering based on scope
-    if scope_sel:
-        df_temp = df_projects.copy()
+        # Dynamic country filtering
         if region_sel:
-            df_temp = df_temp[df_temp["Region"].isin(region_sel)]
-        if country_sel:
-            df_temp = df_temp[df_temp["Country"].isin(country_sel)]
-        df_temp = df_temp[df_temp["Scope"].isin(scope_sel)]
-        type_opts = uniq_sorted(df_temp["Type"]) if "Type" in df_temp else []
+            country_opts = cascade.country_options(region_sel)
     
-    type_sel = st.multiselect("Type", options=type_opts, key="type_sel")
-    st.markdown('</div>', unsafe_allow_html=True)
+        keep_selection("country_sel", country_opts)
+        country_sel = st.multiselect("Country", options=country_opts, format_func=facet_label("Country"), key="country_sel", on_change=note_filter_edit)
+        st.markdown('</div>', unsafe_allow_html=True)
 
-    st.markdown('<div class="filter-section hidden">', unsafe_allow_html=True)
-    st.markdown('<p class="filter-label">📋 by Registry</p>', unsafe_allow_html=True)
+        st.markdown('<div class="filter-section hidden">', unsafe_allow_html=True)
+        st.markdown('<p class="filter-label">🏭 by Project</p>', unsafe_allow_html=True)
     
-    registry_sel = st.multiselect("Registry", options=registry_opts, key="registry_sel")
-    redrem_sel = st.multiselect("Reduction / Removal", options=redrem_all, key="redrem_sel")
-    st.markdown('</div>', unsafe_allow_html=True)
-
-    # Reset button
-    if st.button("🔄 Reset All Filters", key="reset_filters"):
-        # Clear all filter keys
-        keys_to_clear = ["registry_sel", "region_sel", "country_sel", "scope_sel", "type_sel", "redrem_sel", "country_filter"]
-        for key in keys_to_clear:
-            if key in st.session_state:
-                del st.session_state[key]
-        st.rerun()
-
-# ============== APPLY FILTERS ==============
-mask = pd.Series(True, index=df_projects.index)
-
-if st.session_state.region_sel:
-    mask &= df_projects["Region"].isin(st.session_state.region_sel)
-if st.session_state.country_sel:
-    mask &= df_projects["Country"].isin(st.session_state.country_sel)
-if st.session_state.registry_sel:
-    mask &= df_projects["Voluntary_Registry"].isin(st.session_state.registry_sel)
-if st.session_state.scope_sel:
-    mask &= df_projects["Scope"].isin(st.session_state.scope_sel)
-if st.session_state.type_sel:
-    mask &= df_projects["Type"].isin(st.session_state.type_sel)
-if st.session_state.redrem_sel:
-    mask &= df_projects["Reduction_Removal"].isin(st.session_state.redrem_sel)
-
-df_sel = df_projects[mask].copy()
-
-# ============== MAIN CONTENT ==============
-st.markdown('<div class="main-content">', unsafe_allow_html=True)
-
-# Stats overview
-col1, col2, col3, col4 = st.columns(4)
-with col1:
-    st.markdown(f"""
-    <div class="stats-card">
-        <div class="stats-number">{len(df_sel):,}</div>
-        <div class="stats-label">Total Projects</div>
-    </div>
-    """, unsafe_allow_html=True)
-
-with col2:
-    total_issued = df_sel["Total_Credits_Issued"].sum() if "Total_Credits_Issued" in df_sel.columns else 0
-    st.markdown(f"""
-    <div class="stats-card">
-        <div class="stats-number">{total_issued:,.0f}</div>
-        <div class="stats-label">Credits Issued</div>
-    </div>
-    """, unsafe_allow_html=True)
-
-with col3:
-    total_retired = df_sel["Total_Credits_Retired"].sum() if "Total_Credits_Retired" in df_sel.columns else 0
-    st.markdown(f"""
-    <div class="stats-card">
-        <div class="stats-number">{total_retired:,.0f}</div>
-        <div class="stats-label">Credits Retired</div>
-    </div>
-    """, unsafe_allow_html=True)
-
-with col4:
-    countries_count = df_sel["Country"].nunique() if "Country" in df_sel.columns else 0
-    st.markdown(f"""
-    <div class="stats-card">
-        <div class="stats-number">{countries_count}</div>
-        <div class="stats-label">Countries</div>
-    </div>
-    """, unsafe_allow_html=True)
-
-# ============== PROJECT TABLE ==============
-st.markdown('<h2 class="section-header">📊 Projects Overview</h2>', unsafe_allow_html=True)
-
-# Project ID filter for table only
-project_id_filter = st.text_input("🔍 Filter by Project ID (table only)", placeholder="Enter Project ID...")
-
-# Apply project ID filter to table data only
-if project_id_filter:
-    df_table = df_sel[df_sel["Project ID"].astype(str).str.contains(project_id_filter, case=False, na=False)]
-else:
-    df_table = df_sel.copy()
-
-# Format display data
-def fmt_int(x):
-    try:
-        return f"{int(x):,}"
-    except Exception:
-        return x
-
-display_cols = [c for c in [
-    "Project ID", "Project Name", "Voluntary_Registry", "Voluntary_Status", "Region", "Country",
-    "Scope", "Type", "Reduction_Removal",
-    "Total_Credits_Issued", "Total_Credits_Retired", "Total_Credits_Remaining"
-] if c in df_table.columns]
-
-df_display = df_table[display_cols].copy()
-for c in ["Total_Credits_Issued", "Total_Credits_Retired", "Total_Credits_Remaining"]:
-    if c in df_display.columns:
-        df_display[c] = df_display[c].map(fmt_int)
-
-st.dataframe(df_display, use_container_width=True, height=400)
-
-# ============== CHARTS SECTION ==============
-# Helper function for text wrapping
-def wrap_with_br(s: str, width: int = 12) -> str:
-    # Handle specific problematic cases
-    if s == "Long-Duration Removal":
-        return "Long-duration<br>Removal"
-    
-    # Use textwrap to split into lines of at most `width` chars
-    lines = textwrap.wrap(str(s), width=width)
-    return "<br>".join(lines)
-
-# Registry and Reduction/Removal charts
-col1, col2 = st.columns(2)
-
-with col1:
-    st.markdown('<h3 class="section-header">📈 Projects by Registry</h3>', unsafe_allow_html=True)
+        keep_selection("scope_sel", scope_opts)
+        scope_sel = st.multiselect("Scope", options=scope_opts, format_func=facet_label("Scope"), key="scope_sel", on_change=note_filter_edit)
     
-    counts_std = (
-        df_sel["Voluntary_Registry"]
-        .value_counts(dropna=False)
-        .sort_index()
-        .rename_axis("Voluntary_Registry")
-        .reset_index(name="Counts")
-    )
+        # Dynamic type filtering based on scope
+        if scope_sel:
+            type_opts = cascade.type_options(scope_sel, region_sel, country_sel)
     
-    if not counts_std.empty:
-        counts_std["tick_label"] = counts_std["Voluntary_Registry"].apply(lambda s: wrap_with_br(s, 12))
-        
-        fig_std = px.bar(
-            counts_std,
-            x="Voluntary_Registry",
-            y="Counts",
-            text="Counts",
-            color="Counts",
-            color_continuous_scale="viridis",
-            height=500
-        )
-        
-        fig_std.update_xaxes(
-            ticktext=counts_std["tick_label"],
-            tickvals=counts_std["Voluntary_Registry"],
-            tickangle=0,
-            automargin=True,
-            tickfont=dict(size=11),
-        )
-        
-        fig_std.update_traces(
-            hovertemplate="%{x}<br>Projects: %{y:,}<extra></extra>",
-            textposition="outside",
-            cliponaxis=False,
-        )
-        
-        fig_std.update_layout(
-            showlegend=False,
-            margin=dict(t=20, r=10, b=30, l=10),
-            xaxis_title="Voluntary Registry",
-            yaxis_title="Number of Projects",
-        )
-        st.plotly_chart(fig_std, use_container_width=True)
+        keep_selection("type_sel", type_opts)
+        type_sel = st.multiselect("Type", options=type_opts, format_func=facet_label("Type"), key="type_sel", on_change=note_filter_edit)
+        st.markdown('</div>', unsafe_allow_html=True)
 
-with col2:
-    st.markdown('<h3 class="section-header">🌱 Projects by Type</h3>', unsafe_allow_html=True)
-    
-    counts_rr = (
-        df_sel["Reduction_Removal"]
-        .value_counts(dropna=False)
-        .sort_index()
-        .rename_axis("Reduction_Removal")
-        .reset_index(name="Counts")
-    )
+        st.markdown('<div class="filter-section hidden">', unsafe_allow_html=True)
+        st.markdown('<p class="filter-label">📋 by Registry</p>', unsafe_allow_html=True)
     
-    if not counts_rr.empty:
-        counts_rr["tick_label"] = counts_rr["Reduction_Removal"].apply(lambda s: wrap_with_br(s, 12))
-        
-        fig_rr = px.bar(
-            counts_rr,
-            x="Reduction_Removal",
-            y="Counts",
-            text="Counts",
-            color="Counts",
-            color_continuous_scale="plasma",
-            height=500
+        keep_selection("registry_sel", registry_opts)
+        registry_sel = st.multiselect("Registry", options=registry_opts, format_func=facet_label("Voluntary_Registry"), key="registry_sel", on_change=note_filter_edit)
+        keep_selection("redrem_sel", redrem_all)
+        redrem_sel = st.multiselect("Reduction / Removal", options=redrem_all, format_func=facet_label("Reduction_Removal"), key="redrem_sel", on_change=note_filter_edit)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        st.markdown('<div class="filter-section hidden">', unsafe_allow_html=True)
+        st.markdown('<p class="filter-label">🔢 by Credits & Vintage</p>', unsafe_allow_html=True)
+
+        for key, (col, label) in RANGE_KEYS.items():
+            lo, hi = dataset.ranges.bounds(col)
+            if lo < hi:
+                st.session_state.setdefault(key, (lo, hi))
+                st.slider(label, min_value=lo, max_value=hi, key=key, on_change=note_filter_edit)
+        st.markdown('</div>', unsafe_allow_html=True)
+
+        pending = filters_pending()
+        if pending and st.session_state.auto_apply and not st.session_state.apply_timer:
+            # Each call adds a timer, so one per pending spell
+            st.session_state["apply_timer"] = True
+            apply_when_idle()
+        if st.button("✅ Apply Filters", key="apply_filters_btn", type="primary", disabled=not pending):
+            request_apply()
+        if pending:
+            edits = st.session_state.get("filter_edits", 0)
+            when = "after a pause" if st.session_state.auto_apply else "on Apply"
+            st.caption(f"{edits} edit{'s' if edits != 1 else ''} pending, applied {when}")
+        if st.session_state.get("reruns_avoided"):
+            st.caption(f"Full reruns avoided this session: {st.session_state.reruns_avoided:,}")
+
+        # Reset button (applies at once)
+        if st.button("🔄 Reset All Filters", key="reset_filters"):
+            # Clear all filter keys
+            keys_to_clear = ["registry_sel", "region_sel", "country_sel", "scope_sel", "type_sel", "redrem_sel", "country_filter", "compare_release", *RANGE_KEYS]
+            for key in keys_to_clear:
+                if key in st.session_state:
+                    del st.session_state[key]
+            request_apply()
+
+    filter_panel()
+    st.toggle("Apply filter edits automatically", key="auto_apply")
+
+    # Release comparison (only once the history holds another release)
+    known_releases = history.releases()
+    compare_opts = [r for r in known_releases if r != dataset.release] if dataset.release in known_releases else []
+    if st.session_state.get("compare_release") not in compare_opts:
+        st.session_state["compare_release"] = None
+    if compare_opts:
+        st.markdown('<div class="filter-section hidden">', unsafe_allow_html=True)
+        st.markdown('<p class="filter-label">🕑 by Release</p>', unsafe_allow_html=True)
+        st.selectbox(
+            f"Compare {dataset.release} to release",
+            options=[None] + compare_opts,
+            format_func=lambda r: "—" if r is None else r,
+            key="compare_release",
         )
-        
-        fig_rr.update_xaxes(
-            ticktext=counts_rr["tick_label"],
-            tickvals=counts_rr["Reduction_Removal"],
-            tickangle=0,
-            automargin=True,
-            tickfont=dict(size=11),
-        )
-        
-        fig_rr.update_traces(
-            hovertemplate="%{x}<br>Projects: %{y:,}<extra></extra>",
-            textposition="outside",
-            cliponaxis=False,
-        )
-        
-        fig_rr.update_layout(
-            showlegend=False,
-            margin=dict(t=20, r=10, b=30, l=10),
-            xaxis_title="Reduction / Removal",
-            yaxis_title="Number of Projects",
-        )
-        st.plotly_chart(fig_rr, use_container_width=True)
-
-# ============== STACKED CREDITS BY REDUCTION/REMOVAL ==============
-st.markdown('<h2 class="section-header">💰 Credits by Reduction/Removal</h2>', unsafe_allow_html=True)
-
-needed_cols = {"Reduction_Removal", "Total_Credits_Issued", "Total_Credits_Retired", "Total_Credits_Remaining"}
-if df_sel.empty or not needed_cols.issubset(df_sel.columns):
-    st.info("No data to display. Adjust your filters.")
-else:
-    credits_by_rr = (
-        df_sel
-        .groupby("Reduction_Removal", dropna=False)[
-            ["Total_Credits_Issued", "Total_Credits_Retired", "Total_Credits_Remaining"]
-        ]
-        .sum(numeric_only=True)
-        .sort_index()
-    )
+        st.markdown('</div>', unsafe_allow_html=True)
 
-    # Enforce Issued = Retired + Remaining for display
-    credits_by_rr["Total_Credits_Issued_calc"] = (
-        credits_by_rr["Total_Credits_Retired"] + credits_by_rr["Total_Credits_Remaining"]
-    )
-
-    # Show table
-    tb = credits_by_rr[["Total_Credits_Retired", "Total_Credits_Remaining", "Total_Credits_Issued_calc"]].copy()
-    tb = tb.rename(columns={"Total_Credits_Issued_calc": "Total_Credits_Issued"}).astype("int64")
-    st.dataframe(tb.applymap(lambda x: f"{x:,}"), use_container_width=True)
-
-    # Plot: Retired + Remaining stacked, Issued as line
-    bar_df = credits_by_rr.reset_index()
-    bar_df["Reduction_Removal_wrapped"] = bar_df["Reduction_Removal"].apply(lambda s: wrap_with_br(s, 12))
-
-    # Create stacked bar chart for Retired + Remaining
-    fig_cr = go.Figure()
-
-    # Add stacked bars for Retired + Remaining
-    fig_cr.add_trace(go.Bar(
-        x=bar_df["Reduction_Removal_wrapped"],
-        y=bar_df["Total_Credits_Retired"],
-        name="Total Credits Retired",
-        marker_color="#ef4444",
-        text=bar_df["Total_Credits_Retired"],
-        texttemplate="%{text:,}",
-        textposition="outside",
-        hovertemplate="%{x}<br>Retired: %{y:,}<extra></extra>"
+# ============== APPLY FILTERS ==============
+def raw_countries(countries):
+    # Map clicks carry display names; the Country column holds the raw labels
+    names = set(countries)
+    return [c for c, name in dataset.country_names.items() if name in names]
+
+def filter_graph(countries=(), only=None):
+    """The page's data flow for the applied filters, cross-filtered to the
+    countries clicked on the map, as lazy nodes:
+
+        rows -> view                          (stats checks, table, search)
+        cube -> grain -> table/<section> -> figure/<section>
+
+    A node runs only when a section that is drawn reads it; row selections,
+    cube slices, grains and tables are memoized per canonical filter state
+    across sessions. `only` limits the sections (and so the grain) to those.
+    """
+    key = filter_key(dataset.version, selections, countries, ranges)
+    active = filters_active or bool(countries)
+    cube = dataset.cube
+    sections = sections_of(cube.frame.columns, only)
+    type_col = "Type" if "Type" in df_projects.columns else (" Type" if " Type" in df_projects.columns else None)
+    figure_kwargs = {"scope_type": {"type_col": type_col}, "registry_scope_type": {"type_col": type_col}}
+    # Section options picked on the page; the precomputed tables and figures only have the defaults
+    options = {}
+    top = {"k": st.session_state.get("top_k", TOP_K_CHOICES[0]), "rest": st.session_state.get("top_rest", False)}
+    if top != {"k": TOP_K_CHOICES[0], "rest": False}:
+        options["registry_by_country"] = top
+
+    def rows(g):
+        # Bitmap index: OR within a column, AND across columns -> row positions
+        def build():
+            masks = range_bitmaps(ranges)
+            if countries:
+                masks.append(dataset.bitmaps.column_bitmap("Country", raw_countries(countries)))
+            return dataset.bitmaps.select(selections, masks)
+        return memo.rows(key, build) if active else None
+
+    def cube_slice(g):
+        # The same filters on the cube's cells; ranges over columns that aren't
+        # dimensions (credits) re-aggregate the selected rows instead
+        def build():
+            if not cube.covers(ranges):
+                return cube.rollup(g["rows"])
+            masks = [cube.bitmaps.column_bitmap("Country", raw_countries(countries))] if countries else []
+            return cube.slice(selections, ranges, masks)
+        return memo.table(key, "cube", build) if active else cube.frame
+
+    def grain(g):
+        # One group-by at the finest grain of the sections; each table rolls up from it
+        def build():
+            report = {}
+            table = planned_grain(g["cube"], sections, report)
+            g.reports.append(report)
+            return table
+        return memo.table(key, "grain" if only is None else "grain/" + "+".join(sorted(sections)), build)
+
+    def table(name, fn):
+        def node(g):
+            # Unfiltered view is served from the dataset's precomputed aggregates
+            picked = options.get(name, {})
+            if not active and name in dataset.aggregates and not picked:
+                return dataset.aggregates[name]
+            memo_name = name + "".join(f"/{opt}={v}" for opt, v in sorted(picked.items()))
+
+            def build():
+                g.reports.append({"section": name})  # rolled up here, not precomputed or memoized
+                return fn(g["grain"], dataset.country_names, **picked)
+            return memo.table(key, memo_name, build)
+        return node
+
+    def figure(name):
+        def node(g):
+            # Unfiltered view is served from the figures serialized by the warm-up
+            if not active and name in dataset.figures and name not in options:
+                return load_figure(dataset.figures[name])
+            return FIGURES[name](g[f"table/{name}"].copy(), **figure_kwargs.get(name, {}))
+        return node
+
+    graph = LazyGraph()
+    graph.add("rows", rows)
+    graph.add("view", lambda g: FilteredView(df_projects, g["rows"]))
+    graph.add("cube", cube_slice)
+    graph.add("grain", grain)
+    # Vintage sheets hang off the row selection, not the cube
+    graph.add("vintage_credits", lambda g: memo.table(
+        key, "vintage_credits", lambda: credits_by_vintage(dataset.vintages, g["rows"], len(df_projects))
     ))
+    for name, (fn, _) in sections.items():
+        graph.add(f"table/{name}", table(name, fn))
+        graph.add(f"figure/{name}", figure(name))
+    return graph
 
-    fig_cr.add_trace(go.Bar(
-        x=bar_df["Reduction_Removal_wrapped"],
-        y=bar_df["Total_Credits_Remaining"],
-        name="Total Credits Remaining",
-        marker_color="#10b981",
-        text=bar_df["Total_Credits_Remaining"],
-        texttemplate="%{text:,}",
-        textposition="outside",
-        hovertemplate="%{x}<br>Remaining: %{y:,}<extra></extra>"
-    ))
+# ============== MAIN CONTENT ==============
+# A fragment: a country click on the map cross-filters every section below and
+# reruns just them, not the sidebar or the setup above
+@st.fragment
+def main_content():
+    # Keep the URL in step with the filters, so it can be shared at any time
+    link = encode_link(selections, st.session_state.country_filter, ranges, st.session_state.get("project_search", ""))
+    if st.query_params.to_dict() != link:
+        st.query_params.from_dict(link)
+
+    graph = filter_graph(st.session_state.country_filter)
+    df_sel, cube_sel = graph["view"], graph["cube"]
+    sel_rows = df_sel.rows
+
+    # Graphs evaluated this rerun, for the aggregation report
+    plan = {"graphs": [graph]}
+
+    def section_table(name, g=None):
+        return (graph if g is None else g)[f"table/{name}"].copy()  # callers decorate it for display
+
+    def section_figure(name, g=None):
+        # Pulls the section's table through the graph only when drawn
+        return (graph if g is None else g)[f"figure/{name}"]
+
+    st.markdown('<div class="main-content">', unsafe_allow_html=True)
+
+    # Stats overview
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.markdown(f"""
+        <div class="stats-card">
+            <div class="stats-number">{int(cube_sel["Counts"].sum()):,}</div>
+            <div class="stats-label">Total Projects</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col2:
+        total_issued = cube_sel["Total_Credits_Issued"].sum() if "Total_Credits_Issued" in cube_sel.columns else 0
+        st.markdown(f"""
+        <div class="stats-card">
+            <div class="stats-number">{total_issued:,.0f}</div>
+            <div class="stats-label">Credits Issued</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col3:
+        total_retired = cube_sel["Total_Credits_Retired"].sum() if "Total_Credits_Retired" in cube_sel.columns else 0
+        st.markdown(f"""
+        <div class="stats-card">
+            <div class="stats-number">{total_retired:,.0f}</div>
+            <div class="stats-label">Credits Retired</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col4:
+        countries_count = cube_sel["Country"].nunique() if "Country" in cube_sel.columns else 0
+        st.markdown(f"""
+        <div class="stats-card">
+            <div class="stats-number">{countries_count}</div>
+            <div class="stats-label">Countries</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    # ============== PROJECT TABLE ==============
+    st.markdown('<h2 class="section-header">📊 Projects Overview</h2>', unsafe_allow_html=True)
+
+    # Project ID / name search for table only
+    project_id_filter = st.text_input("🔍 Search Project ID or Name (table only)", placeholder="Enter Project ID or name...", key="project_search")
+
+    # Apply the search to table data only, within the current filter selection
+    if project_id_filter:
+        hit_rows, match = dataset.search.search(project_id_filter, rows=sel_rows)
+        df_table = FilteredView(df_projects, hit_rows)
+        if match == "fuzzy" and len(hit_rows):
+            st.caption(f"No exact match for “{project_id_filter.strip()}”, showing {len(hit_rows):,} close matches")
+    else:
+        df_table = df_sel
+
+    # Format display data
+    def fmt_int(x):
+        try:
+            return f"{int(x):,}"
+        except Exception:
+            return x
+
+    display_cols = [c for c in [
+        "Project ID", "Project Name", "Voluntary_Registry", "Voluntary_Status", "Region", "Country",
+        "Scope", "Type", "Reduction_Removal",
+        "Total_Credits_Issued", "Total_Credits_Retired", "Total_Credits_Remaining"
+    ] if c in df_table.columns]
+
+    # The only per-rerun frame of the table: display columns of the matching rows
+    df_display = df_table.frame(display_cols)
+    for c in ["Total_Credits_Issued", "Total_Credits_Retired", "Total_Credits_Remaining"]:
+        if c in df_display.columns:
+            df_display[c] = df_display[c].map(fmt_int)
+
+    st.dataframe(df_display, use_container_width=True, height=400)
+
+    # ============== CHANGES SINCE RELEASE ==============
+    if st.session_state.compare_release:
+        base_release = st.session_state.compare_release
+        st.markdown(f'<h2 class="section-header">🔄 Changes from {base_release} to {dataset.release}</h2>', unsafe_allow_html=True)
+
+        # Stored with the release when it was ingested; only the filter selections are applied here
+        changes = history.diff(base_release, dataset.release)
+        cmask = np.ones(len(changes), dtype=bool)
+        for col, values in selections.items():
+            if values and col in changes.columns:
+                cmask &= changes[col].isin(values).to_numpy()
+        if st.session_state.country_filter and "Country" in changes.columns:
+            cmask &= changes["Country"].map(dataset.country_names).isin(st.session_state.country_filter).to_numpy()
+        changes = changes[cmask]
+
+        # Missing statuses are None; numpy compares them equal, where pandas would not
+        status_moved = changes["Status_Before"].to_numpy() != changes["Status_After"].to_numpy()
+        n_status = int((changes["Change"].eq("changed").to_numpy() & status_moved).sum())
+        stats = [
+            (f"{int(changes['Change'].eq('added').sum()):,}", "Projects Added"),
+            (f"{int(changes['Change'].eq('removed').sum()):,}", "Projects Removed"),
+            (f"{n_status:,}", "Status Changes"),
+            (f"{int(changes['Delta_Total_Credits_Issued'].sum()):+,}", "Δ Credits Issued"),
+        ]
+        for col, (number, label) in zip(st.columns(4), stats):
+            with col:
+                st.markdown(f"""
+                <div class="stats-card">
+                    <div class="stats-number">{number}</div>
+                    <div class="stats-label">{label}</div>
+                </div>
+                """, unsafe_allow_html=True)
+
+        if changes.empty:
+            st.info("No changes between these releases for the current filters.")
+        else:
+            delta_cols = [c for c in changes.columns if c.startswith("Delta_")]
+            changes_view = changes.iloc[np.argsort(-changes["Delta_Total_Credits_Issued"].abs().to_numpy(), kind="stable")]
+            changes_view = changes_view[
+                ["Project ID", "Change", "Voluntary_Registry", "Country", "Status_Before", "Status_After"] + delta_cols
+            ].rename(columns={c: c.replace("Delta_Total_", "Δ ").replace("_", " ") for c in delta_cols})
+            st.dataframe(changes_view, use_container_width=True, height=300, hide_index=True)
 
-    # Add Issued as total line with markers
-    fig_cr.add_trace(go.Scatter(
-        x=bar_df["Reduction_Removal_wrapped"],
-        y=bar_df["Total_Credits_Issued_calc"],
-        mode="lines+markers",
-        name="Total Credits Issued",
-        marker=dict(size=8, color="#667eea"),
-        line=dict(width=2, color="#667eea"),
-        hovertemplate="%{x}<br>Total Issued: %{y:,}<extra></extra>"
-    ))
+    # ============== CHARTS SECTION ==============
+    # Registry and Reduction/Removal charts
+    col1, col2 = st.columns(2)
 
-    # Update layout for stacked bars
-    fig_cr.update_layout(
-        barmode="stack",
-        margin=dict(t=55, r=10, b=30, l=10),
-        xaxis_title="Reduction / Removal",
-        yaxis_title="Credits",
-        legend_title_text="Category",
-        xaxis=dict(tickangle=0, automargin=True)
-    )
+    with col1:
+        st.markdown('<h3 class="section-header">📈 Projects by Registry</h3>', unsafe_allow_html=True)
 
-    st.plotly_chart(fig_cr, use_container_width=True)
-
-# ============== PROJECTS BY REDUCTION/REMOVAL BY STANDARD ==============
-st.markdown('<h2 class="section-header">📋 Projects by Reduction/Removal by Standard</h2>', unsafe_allow_html=True)
-
-needed_cols = {"Voluntary_Registry", "Reduction_Removal"}
-if df_sel.empty or not needed_cols.issubset(df_sel.columns):
-    st.info("No data to display. Adjust your filters.")
-else:
-    # Long-form counts
-    projects_by_redrem_by_std = (
-        df_sel.groupby("Voluntary_Registry")["Reduction_Removal"]
-        .value_counts(dropna=False)
-        .rename("Counts")
-        .reset_index()
-        .sort_values(["Voluntary_Registry", "Reduction_Removal"])
-    )
+        counts_std = section_table("registry_counts")
 
-    # Show crosstab table
-    ctab = pd.crosstab(
-        index=projects_by_redrem_by_std["Voluntary_Registry"],
-        columns=projects_by_redrem_by_std["Reduction_Removal"],
-        values=projects_by_redrem_by_std["Counts"],
-        aggfunc="sum",
-    ).fillna(0).astype(int).sort_index()
-    # st.dataframe(ctab, use_container_width=True)
-
-    # Plotly stacked bar
-    df_plot = projects_by_redrem_by_std.copy()
-    df_plot["Voluntary_Registry_wrapped"] = df_plot["Voluntary_Registry"].apply(lambda s: wrap_with_br(s, 14))
-
-    fig_ct = px.bar(
-        df_plot,
-        x="Voluntary_Registry_wrapped",
-        y="Counts",
-        color="Reduction_Removal",
-        barmode="stack",
-        text="Counts",
-        # title="Projects by Reduction/Removal per Registry",
-        color_discrete_sequence=px.colors.qualitative.Set3
-    )
-    fig_ct.update_traces(
-        texttemplate="%{text:,}",
-        hovertemplate="%{x}<br>%{legendgroup}: %{y:,}<extra></extra>",
-        cliponaxis=False,
-    )
-    fig_ct.update_layout(
-        margin=dict(t=55, r=10, b=40, l=10),
-        xaxis_title="Voluntary Registry",
-        yaxis_title="Number of Projects",
-    )
-    fig_ct.update_xaxes(tickangle=0, automargin=True)
+        if not counts_std.empty:
+            fig_std = section_figure("registry_counts")
+            st.plotly_chart(fig_std, use_container_width=True)
+        else:
+            st.info("No data to display. Adjust your filters.")
 
-    st.plotly_chart(fig_ct, use_container_width=True)
+    with col2:
+        st.markdown('<h3 class="section-header">🌱 Projects by Type</h3>', unsafe_allow_html=True)
 
-# ============== SUNBURST CHARTS IN 1x2 LAYOUT ==============
-st.markdown('<h2 class="section-header">🏢 Projects by Scope & by Standard</h2>', unsafe_allow_html=True)
+        counts_rr = section_table("redrem_counts")
 
-# Create 1 row x 2 columns layout
-col1, col2 = st.columns(2)
+        if not counts_rr.empty:
+            fig_rr = section_figure("redrem_counts")
+            st.plotly_chart(fig_rr, use_container_width=True)
+        else:
+            st.info("No data to display. Adjust your filters.")
 
-with col1:
-    # st.markdown('<h3 class="section-header">🎯 Projects by Scope</h3>', unsafe_allow_html=True)
-    
-    type_col = "Type" if "Type" in df_sel.columns else (" Type" if " Type" in df_sel.columns else None)
-    needed_cols = {"Scope", type_col} if type_col else set()
+    # ============== STACKED CREDITS BY REDUCTION/REMOVAL ==============
+    st.markdown('<h2 class="section-header">💰 Credits by Reduction/Removal</h2>', unsafe_allow_html=True)
 
-    if (df_sel.empty) or (not needed_cols) or (not needed_cols.issubset(df_sel.columns)):
+    needed_cols = {"Reduction_Removal", "Total_Credits_Issued", "Total_Credits_Retired", "Total_Credits_Remaining"}
+    if df_sel.empty or not needed_cols.issubset(df_sel.columns):
         st.info("No data to display. Adjust your filters.")
     else:
-        # Long-form counts
-        scope_type = (
-            df_sel.groupby("Scope")[type_col]
-            .value_counts(dropna=False)
-            .rename("Counts")
-            .reset_index()
-            .sort_values(["Scope", type_col])
-        )
+        # Issued is enforced as Retired + Remaining (Total_Credits_Issued_calc)
+        credits_by_rr = section_table("credits_by_redrem")
 
-        # Sunburst chart
-        fig_sb = px.sunburst(
-            scope_type,
-            path=["Scope", type_col],
-            values="Counts",
-            hover_data={"Counts": True},
-            width=500, height=500,
-            color_discrete_sequence=px.colors.qualitative.Pastel
-        )
+        # Show table
+        tb = credits_by_rr[["Total_Credits_Retired", "Total_Credits_Remaining", "Total_Credits_Issued_calc"]].copy()
+        tb = tb.rename(columns={"Total_Credits_Issued_calc": "Total_Credits_Issued"}).astype("int64")
+        st.dataframe(tb.applymap(lambda x: f"{x:,}"), use_container_width=True)
 
-        fig_sb.update_layout(
-            margin=dict(t=40, r=10, b=40, l=10)
-        )
+        # Plot: Retired + Remaining stacked, Issued as line
+        fig_cr = section_figure("credits_by_redrem")
+        st.plotly_chart(fig_cr, use_container_width=True)
 
-        fig_sb.update_traces(textfont_size=12)
+    # ============== PROJECTS BY REDUCTION/REMOVAL BY STANDARD ==============
+    st.markdown('<h2 class="section-header">📋 Projects by Reduction/Removal by Standard</h2>', unsafe_allow_html=True)
 
-        st.plotly_chart(fig_sb, use_container_width=True)
-
-with col2:
-    # st.markdown('<h3 class="section-header">🏢 Projects by Scope by Standard</h3>', unsafe_allow_html=True)
-    
-    type_col = "Type" if "Type" in df_sel.columns else (" Type" if " Type" in df_sel.columns else None)
-    needed_cols = {"Voluntary_Registry", "Scope", type_col} if type_col else set()
-
-    if (df_sel.empty) or (not needed_cols) or (not needed_cols.issubset(df_sel.columns)):
+    needed_cols = {"Voluntary_Registry", "Reduction_Removal"}
+    if df_sel.empty or not needed_cols.issubset(df_sel.columns):
         st.info("No data to display. Adjust your filters.")
     else:
-        # Long-form counts
-        reg_scope_type = (
-            df_sel.groupby(["Voluntary_Registry", "Scope"])[type_col]
-            .value_counts(dropna=False)
-            .rename("Counts")
-            .reset_index()
-            .sort_values(["Voluntary_Registry", "Scope", type_col])
-        )
+        # Plotly stacked bar of the long-form counts
+        fig_ct = section_figure("redrem_by_registry")
+        st.plotly_chart(fig_ct, use_container_width=True)
 
-        # Sunburst chart
-        fig_sb2 = px.sunburst(
-            reg_scope_type,
-            path=["Voluntary_Registry", "Scope", type_col],
-            values="Counts",
-            hover_data={"Counts": True},
-            width=500, height=500,
-            color_discrete_sequence=px.colors.qualitative.Set2
-        )
-        
-        fig_sb2.update_layout(
-            margin=dict(t=40, r=10, b=40, l=10)
-        )
+    # ============== SUNBURST CHARTS IN 1x2 LAYOUT ==============
+    st.markdown('<h2 class="section-header">🏢 Projects by Scope & by Standard</h2>', unsafe_allow_html=True)
 
-        fig_sb2.update_traces(textfont_size=12)
+    # Create 1 row x 2 columns layout
+    col1, col2 = st.columns(2)
 
-        st.plotly_chart(fig_sb2, use_container_width=True)
+    with col1:
+        # st.markdown('<h3 class="section-header">🎯 Projects by Scope</h3>', unsafe_allow_html=True)
 
-# ============== DISTRIBUTION OF PROJECTS ACROSS COUNTRIES ==============
-st.markdown('<h2 class="section-header">🌍 Distribution of Projects Across Countries</h2>', unsafe_allow_html=True)
+        type_col = "Type" if "Type" in df_sel.columns else (" Type" if " Type" in df_sel.columns else None)
+        needed_cols = {"Scope", type_col} if type_col else set()
 
-def standardize_country(name):
-    try:
-        return pycountry.countries.lookup(name).name
-    except LookupError:
-        return name
+        if (df_sel.empty) or (not needed_cols) or (not needed_cols.issubset(df_sel.columns)):
+            st.info("No data to display. Adjust your filters.")
+        else:
+            # Sunburst chart of the long-form counts
+            fig_sb = section_figure("scope_type")
 
-needed_cols = {"Country"}
-if df_sel.empty or not needed_cols.issubset(df_sel.columns):
-    st.info("No data to display. Adjust your filters.")
-else:
-    # Counts by country from the filtered dataset
-    mapping = df_sel["Country"].value_counts(dropna=False).reset_index(name="Counts")
-    mapping.rename(columns={"index": "Country"}, inplace=True)
-    mapping["Country"] = mapping["Country"].apply(standardize_country)
+            st.plotly_chart(fig_sb, use_container_width=True)
 
-    # Apply only the click selection (if any)
-    if st.session_state.country_filter:
-        mapping_view = mapping[mapping["Country"].isin(st.session_state.country_filter)].copy()
-    else:
-        mapping_view = mapping.copy()
-
-    # Show table
-    # st.dataframe(mapping_view, use_container_width=True)
-
-    # Build full map
-    fig_map = px.choropleth(
-        data_frame=mapping,
-        locations="Country",
-        locationmode="country names",
-        color="Counts",
-        hover_name="Country",
-        color_continuous_scale="Viridis",
-        custom_data=["Country"],
-    )
-    
-    fig_map.update_layout(
-        paper_bgcolor="rgba(0,0,0,0)", 
-        plot_bgcolor="rgba(0,0,0,0)", 
-        font=dict(color="white"),
-        margin=dict(t=40, r=10, b=40, l=10),
-        geo=dict(bgcolor="rgba(0,0,0,0)", showframe=False, showcoastlines=False, showland=False, showocean=False, showcountries=False)
-    )
-    fig_map.update_geos(fitbounds="locations", visible=False, bgcolor="rgba(0,0,0,0)")
-    fig_map.update_traces(marker_opacity=0.7, marker_line_width=0)
+    with col2:
+        # st.markdown('<h3 class="section-header">🏢 Projects by Scope by Standard</h3>', unsafe_allow_html=True)
 
-    # st.caption("Tip: click a country on the map to filter. Use the reset button to clear.")
-    clicks = plotly_events(
-        fig_map, click_event=True, select_event=False, hover_event=False,
-        override_height=600, override_width="100%"
-    )
+        type_col = "Type" if "Type" in df_sel.columns else (" Type" if " Type" in df_sel.columns else None)
+        needed_cols = {"Voluntary_Registry", "Scope", type_col} if type_col else set()
 
-    if clicks:
-        cd = clicks[0].get("customdata")
-        clicked = (cd[0] if isinstance(cd, list) and cd else None) or clicks[0].get("location")
-        if clicked:
-            st.session_state.country_filter = [clicked]
-            st.rerun()
-
-# ============== DISTRIBUTION OF PROJECTS ACROSS COUNTRIES BY STANDARD ==============
-# st.markdown('<h2 class="section-header">🗺️ Distribution of Projects Across Countries by Standard</h2>', unsafe_allow_html=True)
-def standardize_country(name):
-    try:
-        return pycountry.countries.lookup(name).name
-    except Exception:
-        return name
-
-needed_cols = {"Country", "Voluntary_Registry", "Project ID"}
-if df_sel.empty or not needed_cols.issubset(df_sel.columns):
-    st.info("No data to display. Adjust your filters.")
-else:
-    # Pivot: rows = Country, columns = Registry, values = Project count
-    four_blocks = (
-        df_sel.pivot_table(
-            index="Country",
-            columns="Voluntary_Registry",
-            values="Project ID",
-            aggfunc="count",
-        )
-        .fillna(0)
-        .astype(int)
-        .reset_index()
-    )
+        if (df_sel.empty) or (not needed_cols) or (not needed_cols.issubset(df_sel.columns)):
+            st.info("No data to display. Adjust your filters.")
+        else:
+            # Sunburst chart of the long-form counts
+            fig_sb2 = section_figure("registry_scope_type")
 
-    # Normalize country names
-    four_blocks["Country"] = four_blocks["Country"].apply(standardize_country)
-
-    # Show the table
-    # st.dataframe(four_blocks, use_container_width=True)
-
-    # Which registry columns to plot
-    desired = ["VCS", "GOLD", "ACR", "CAR"]
-    available = [c for c in desired if c in four_blocks.columns]
-    if len(available) < 4:
-        # Try common alternates
-        alternates = {
-            "VCS": ["Verra", "Verified Carbon Standard"],
-            "GOLD": ["Gold Standard"],
-            "ACR": ["American Carbon Registry"],
-            "CAR": ["Climate Action Reserve"],
-        }
-        for short, alts in alternates.items():
-            if short not in available:
-                for alt in alts:
-                    if alt in four_blocks.columns:
-                        four_blocks[short] = four_blocks[alt]
-                        available.append(short)
-                        break
-        available = [c for c in desired if c in set(available)]
-
-    # Helper to build one choropleth
-    def make_map(df, value_col, title):
-        fig = px.choropleth(
-            data_frame=df,
-            locations="Country",
-            locationmode="country names",
-            color=value_col,
-            hover_name="Country",
-            title=title,
-            projection="mercator",
-            color_continuous_scale="Viridis",
-        )
-        fig.update_layout(
-            margin=dict(t=20, r=10, b=5, l=10),
-        )
-        fig.update_geos(fitbounds="locations", visible=False, bgcolor="rgba(0,0,0,0)")
-        return fig
-
-    # Build figures (up to 4)
-    figs = []
-    titles = {
-        "VCS": "VCS projects in every country",
-        "GOLD": "GOLD projects in every country",
-        "ACR": "ACR projects in every country",
-        "CAR": "CAR projects in every country",
-    }
-    for col in available:
-        figs.append(make_map(four_blocks, col, titles.get(col, f"{col} projects in every country")))
-
-    # Render as 2×2 grid
-    c1, c2 = st.columns(2)
-    with c1:
-        if len(figs) > 0:
-            st.plotly_chart(figs[0], use_container_width=True)
-    with c2:
-        if len(figs) > 1:
-            st.plotly_chart(figs[1], use_container_width=True)
-
-    c3, c4 = st.columns(2)
-    with c3:
-        if len(figs) > 2:
-            st.plotly_chart(figs[2], use_container_width=True)
-    with c4:
-        if len(figs) > 3:
-            st.plotly_chart(figs[3], use_container_width=True)
-
-# ============== PROJECT STARTS BY STANDARD OVER TIME ==============
-st.markdown('<h2 class="section-header">📅 Project Starts by Standard Over Time (by First Vintage Year)</h2>', unsafe_allow_html=True)
-
-needed_cols = {"Voluntary_Registry", "First_Vintage_Year"}
-if df_sel.empty or not needed_cols.issubset(df_sel.columns):
-    st.info("No data to display. Adjust your filters.")
-else:
-    # Group counts
-    first_year_vintage = (
-        df_sel.groupby("Voluntary_Registry")["First_Vintage_Year"]
-        .value_counts(dropna=False)
-        .rename("Counts")
-        .reset_index()
-    )
+            st.plotly_chart(fig_sb2, use_container_width=True)
 
-    # Ensure datetime type for plotting
-    first_year_vintage["First_Vintage_Year"] = pd.to_numeric(
-        first_year_vintage["First_Vintage_Year"], errors="coerce"
-    ).dropna()
-    first_year_vintage["First_Vintage_Year"] = pd.to_datetime(
-        first_year_vintage["First_Vintage_Year"], format="%Y"
-    )
+    # ============== DISTRIBUTION OF PROJECTS ACROSS COUNTRIES ==============
+    st.markdown('<h2 class="section-header">🌍 Distribution of Projects Across Countries</h2>', unsafe_allow_html=True)
 
-    # Pivot: rows = vintage years, columns = registries, values = project counts
-    pivot_vintage = (
-        first_year_vintage.pivot_table(
-            index="First_Vintage_Year",
-            columns="Voluntary_Registry",
-            values="Counts",
-            aggfunc="sum",
-        )
-        .fillna(0)
-        .astype(int)
-        .sort_index()
-    )
-
-    # Line chart
-    pivot_reset = pivot_vintage.reset_index().melt(
-        id_vars="First_Vintage_Year",
-        var_name="Registry",
-        value_name="Counts",
-    )
+    # Counts by country from the sidebar filters only: the map is where the
+    # country cross-filter is picked, so it keeps showing every country
+    map_graph = filter_graph(only=["country_counts"]) if st.session_state.country_filter else graph
+    if map_graph is not graph:
+        plan["graphs"].append(map_graph)
 
-    fig_vintage = px.line(
-        pivot_reset,
-        x="First_Vintage_Year",
-        y="Counts",
-        color="Registry",
-        markers=True,
-        color_discrete_sequence=px.colors.qualitative.Set1
-    )
+    needed_cols = {"Country"}
+    if map_graph["view"].empty or not needed_cols.issubset(df_sel.columns):
+        st.info("No data to display. Adjust your filters.")
+    else:
+        if st.session_state.country_filter:
+            st.caption(f"Cross-filtered to {', '.join(st.session_state.country_filter)}. Click it again to clear.")
 
-    fig_vintage.update_layout(
-        margin=dict(t=50, r=10, b=40, l=10),
-        xaxis=dict(title="First Vintage Year", tickformat="%Y"),
-        yaxis=dict(title="Number of Projects"),
-    )
+        # Build full map
+        fig_map = section_figure("country_counts", map_graph)
 
-    fig_vintage.update_xaxes(range=[pivot_vintage.index.min(), pivot_vintage.index.max()])
+        # st.caption("Tip: click a country on the map to filter. Use the reset button to clear.")
+        clicks = plotly_events(
+            fig_map, click_event=True, select_event=False, hover_event=False,
+            override_height=600, override_width="100%", key=f"country_map_{st.session_state.get('map_clicks', 0)}"
+        )
 
-    st.plotly_chart(fig_vintage, use_container_width=True)
+        if clicks:
+            cd = clicks[0].get("customdata")
+            clicked = (cd[0] if isinstance(cd, list) and cd else None) or clicks[0].get("location")
+            if clicked:
+                # Clicking the selected country again clears it
+                st.session_state.country_filter = [] if st.session_state.country_filter == [clicked] else [clicked]
+                # A fresh component each click, so its last event isn't replayed
+                st.session_state["map_clicks"] = st.session_state.get("map_clicks", 0) + 1
+                st.rerun(scope="fragment")
+
+    # ============== DISTRIBUTION OF PROJECTS ACROSS COUNTRIES BY STANDARD ==============
+    # st.markdown('<h2 class="section-header">🗺️ Distribution of Projects Across Countries by Standard</h2>', unsafe_allow_html=True)
+
+    needed_cols = {"Country", "Voluntary_Registry", "Project ID"}
+    if df_sel.empty or not needed_cols.issubset(df_sel.columns):
+        st.info("No data to display. Adjust your filters.")
+    else:
+        # One choropleth per registry (up to 4) from the pivot: rows = Country
+        # (normalized names), columns = Registry, values = Project count
+        figs = section_figure("country_by_registry")
+
+        # Render as 2×2 grid
+        c1, c2 = st.columns(2)
+        with c1:
+            if len(figs) > 0:
+                st.plotly_chart(figs[0], use_container_width=True)
+        with c2:
+            if len(figs) > 1:
+                st.plotly_chart(figs[1], use_container_width=True)
+
+        c3, c4 = st.columns(2)
+        with c3:
+            if len(figs) > 2:
+                st.plotly_chart(figs[2], use_container_width=True)
+        with c4:
+            if len(figs) > 3:
+                st.plotly_chart(figs[3], use_container_width=True)
+
+    # ============== PROJECT STARTS BY STANDARD OVER TIME ==============
+    st.markdown('<h2 class="section-header">📅 Project Starts by Standard Over Time (by First Vintage Year)</h2>', unsafe_allow_html=True)
+
+    needed_cols = {"Voluntary_Registry", "First_Vintage_Year"}
+    if df_sel.empty or not needed_cols.issubset(df_sel.columns):
+        st.info("No data to display. Adjust your filters.")
+    else:
+        # Line chart of the pivot: rows = vintage years (datetime), columns = registries, values = project counts
+        fig_vintage = section_figure("vintage_by_registry")
 
-# ============== TOP 20 COUNTRIES ==============
-st.markdown('<h2 class="section-header">🏆 Top 10 Countries with Most Projects</h2>', unsafe_allow_html=True)
+        st.plotly_chart(fig_vintage, use_container_width=True)
 
-needed_cols = {"Voluntary_Registry", "Country", "Project ID"}
-if df_sel.empty or not needed_cols.issubset(df_sel.columns):
-    st.info("No data to display. Adjust your filters.")
-else:
-    # Long-form counts
-    projects_country = (
-        df_sel.groupby("Voluntary_Registry")["Country"]
-        .value_counts(dropna=False)
-        .rename("Counts")
-        .reset_index()
-    )
+    # ============== CREDITS BY VINTAGE ==============
+    # From the ISSUANCES / RETIREMENTS sheets, when the workbook has them
+    if dataset.vintages:
+        st.markdown('<h2 class="section-header">🧾 Credits Issued & Retired by Vintage</h2>', unsafe_allow_html=True)
 
-    # Pivot: rows = Country, columns = Registry, values = Counts
-    project_country_2 = (
-        projects_country.pivot_table(
-            index="Country",
-            columns="Voluntary_Registry",
-            values="Counts",
-            aggfunc="sum",
-        )
-        .fillna(0)
-        .astype(int)
-        .reset_index()
-    )
+        credits_vintage = graph["vintage_credits"]
+        if credits_vintage.empty:
+            st.info("No data to display. Adjust your filters.")
+        else:
+            st.plotly_chart(vintage_credit_lines(credits_vintage), use_container_width=True)
 
-    # Normalize/ensure expected registry columns exist
-    desired = ["ACR", "ART", "CAR", "GOLD", "VCS"]
-    alternates = {
-        "VCS": ["Verra", "Verified Carbon Standard"],
-        "GOLD": ["Gold Standard"],
-        "ACR": ["American Carbon Registry"],
-        "CAR": ["Climate Action Reserve"],
-        "ART": ["Architecture for REDD+ Transactions", "ART TREES"],
-    }
-    for short, alts in alternates.items():
-        if short not in project_country_2.columns:
-            for alt in alts:
-                if alt in project_country_2.columns:
-                    project_country_2[short] = project_country_2[alt]
-                    break
-    
-    for col in desired:
-        if col not in project_country_2.columns:
-            project_country_2[col] = 0
-
-    # Compute total across registries
-    project_country_2["Sum"] = project_country_2[desired].sum(axis=1)
-
-    # Sort by Sum desc and take top 10
-    top10 = project_country_2.sort_values(by="Sum", ascending=False).head(10).copy()
-
-    # Horizontal stacked bar
-    fig_top10 = px.bar(
-        top10.sort_values("Sum", ascending=False),
-        x="Country",
-        y=desired,
-        orientation="v",
-        color_discrete_sequence=px.colors.qualitative.Set3
-    )
-    fig_top10.update_layout(
-        barmode="stack",
-        margin=dict(t=40, r=10, b=10, l=10),
-        xaxis_title="Country",
-        yaxis_title="Number of Projects",
-    )
+    # ============== TOP COUNTRIES ==============
+    st.session_state.setdefault("top_k", TOP_K_CHOICES[0])
+    st.session_state.setdefault("top_rest", False)
+    st.markdown(f'<h2 class="section-header">🏆 Top {st.session_state.top_k} Countries with Most Projects</h2>', unsafe_allow_html=True)
 
-    st.plotly_chart(fig_top10, use_container_width=True)
+    needed_cols = {"Voluntary_Registry", "Country", "Project ID"}
+    if df_sel.empty or not needed_cols.issubset(df_sel.columns):
+        st.info("No data to display. Adjust your filters.")
+    else:
+        k_col, rest_col = st.columns([3, 1])
+        with k_col:
+            st.radio("Countries", TOP_K_CHOICES, horizontal=True, key="top_k")
+        with rest_col:
+            st.toggle("Rest of world", key="top_rest")
+
+        # Stacked bar of the K countries with most projects, broken down by registry
+        fig_top10 = section_figure("registry_by_country")
+
+        st.plotly_chart(fig_top10, use_container_width=True)
+
+    st.markdown('</div>', unsafe_allow_html=True)  # Close main-content
+
+    # Only tables rolled up in this process count: each would have been its
+    # own group-by without the planned grain. Nothing to say when every table
+    # came precomputed or from the memo
+    reports = [r for g in plan["graphs"] for r in g.reports]
+    passes = [r for r in reports if "grain" in r]
+    tables = sum("section" in r for r in reports)
+    if passes:
+        logging.getLogger("offsets_aggregates").info(
+            "Rerun aggregation: %d section tables from %d group-by passes (%d saved), %d of %d nodes evaluated%s",
+            tables, len(passes), tables - len(passes),
+            sum(len(g.evaluated) for g in plan["graphs"]), sum(len(g) for g in plan["graphs"]),
+            "".join(f"; grain {r['grain_rows']:,} of {r['rows']:,} rows in {r['ms']} ms" for r in passes),
+        )
 
-st.markdown('</div>', unsafe_allow_html=True)  # Close main-content
+main_content()
 
 # ============== DATA SOURCE ==============
-st.markdown("""
+st.markdown(f"""
 <div style="text-align: center; margin-top: 2rem; padding: 1rem; background: rgba(30, 41, 59, 0.3); border-radius: 0.5rem; border: 1px solid #374151;">
     <p style="color: #cbd5e1; font-size: 0.875rem; line-height: 1.6;">
         Data source: Barbara K Haya, Tyler Bernard, Aline Abayo, Xinyun Rong, Ivy S. So, Micah Elias. (2025). 
-        <strong>Voluntary Registry Offsets Database v2025-06</strong>. Berkeley Carbon Trading Project, University of California, Berkeley. 
+        <strong>Voluntary Registry Offsets Database {dataset.release}</strong>. Berkeley Carbon Trading Project, University of California, Berkeley. 
         Retrieved from https://gspp.berkeley.edu/berkeley-carbon-trading-project/offsets-database. 
         Licensed under CC BY 4.0.
     </p>
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Offline build of every derived dataset artifact, so the dashboard only has to
+memory-map files at startup instead of parsing, aggregating and plotting on
+the first rerun after a deploy:
+
+    python precompute.py [--workbook data/...xlsx]
+
+Artifacts land in precomputed/<version>/ next to the workbook, where
+<version> is the workbook's content version.
+"""
+
+import argparse
+import logging
+import os
+import time
+
+from offsets_data import (
+    EXCEL_PATH, SHEET_NAME, SKIP_ROWS, ReleaseHistory, latest_workbook, load_dataset, write_artifacts,
+)
+from offsets_figures import warm_up
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute dashboard artifacts")
+    parser.add_argument("--workbook", default=None,
+                        help="workbook to build from (default: newest release next to %s)" % EXCEL_PATH)
+    parser.add_argument("--sheet", default=SHEET_NAME)
+    parser.add_argument("--skip-rows", type=int, default=SKIP_ROWS)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    workbook = args.workbook or latest_workbook(EXCEL_PATH)
+    t0 = time.perf_counter()
+    dataset = load_dataset(workbook, args.sheet, args.skip_rows, use_artifacts=False)
+    warm_up(dataset)  # serialized figures of the unfiltered view
+    folder = write_artifacts(dataset, args.sheet, args.skip_rows)
+
+    history = ReleaseHistory(os.path.join(os.path.dirname(workbook), "history"))
+    history.ingest(dataset.release, dataset.df, dataset.version)
+    history.prepare_diffs(dataset.release)
+
+    total = 0
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            size = os.path.getsize(os.path.join(root, name))
+            total += size
+            print(f"  {os.path.relpath(os.path.join(root, name), folder):<40} {size / 1024:10.1f} KB")
+    print(f"{dataset.release} ({dataset.version}): {len(dataset.df):,} projects, "
+          f"{total / 2**20:.1f} MB in {folder} ({time.perf_counter() - t0:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The dashboard modules are flat files at the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+WORKBOOK = "data/Voluntary-Registry-Offsets-Database--v2025-06.xlsx"
+REGIONS = {
+    "Asia": ["India", "China", "Viet Nam"],
+    "Africa": ["Kenya", "Ghana"],
+    "South America": ["Brazil", "Peru"],
+}
+SCOPES = {
+    "Forestry & Land Use": ["REDD+", "Afforestation/Reforestation"],
+    "Renewable Energy": ["Wind", "Solar"],
+    "Household & Community": ["Cookstoves"],
+}
+REGISTRIES = ["VCS", "GOLD", "ACR", "CAR", "ART"]
+HEADER = [
+    "Project ID", "Project Name", "Voluntary\nRegistry", "ARB / WA  Project", "Voluntary Status", "Scope", "Type",
+    "Reduction / Removal", "Methodology / Protocol", "Methodology Version", "Region", "Country", "State",
+    "Project Site Location", "Project Developer", "Total Credits \nIssued", "Total Credits Retired",
+    "Total Credits Remaining", "Total Buffer Pool Deposits", "Reversals Covered by Buffer Pool",
+    "Reversals Not Covered by Buffer", "Buffer Credits Released to Project", "First Year of Project (Vintage)",
+]
+
+
+def write_workbook(path, n=300, seed=0):
+    """A small offsets database laid out like the published workbook: three
+    title rows above the PROJECTS header, plus the vintage sheets."""
+    from openpyxl import Workbook
+
+    rng = np.random.default_rng(seed)
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "PROJECTS"
+    ws.append(["Voluntary Registry Offsets Database"])
+    ws.append(["Synthetic test release"])
+    ws.append([])
+    ws.append(HEADER)
+    ids = []
+    for i in range(n):
+        registry = REGISTRIES[rng.integers(len(REGISTRIES))]
+        region = list(REGIONS)[rng.integers(len(REGIONS))]
+        country = REGIONS[region][rng.integers(len(REGIONS[region]))]
+        scope = list(SCOPES)[rng.integers(len(SCOPES))]
+        kind = SCOPES[scope][rng.integers(len(SCOPES[scope]))]
+        issued = int(rng.integers(0, 100_000))
+        retired = int(rng.integers(0, issued + 1))
+        ids.append(f"{registry}{1000 + i}")
+        ws.append([
+            ids[-1], f"{kind} project in {country} number {i}", registry, "",
+            ["Registered", "Completed", None][rng.integers(3)], scope, kind,
+            ["Reduction", "Removal", "Mixed"][rng.integers(3)], "M", "1.0", region, country, "", "", "Dev",
+            issued, retired, issued - retired, int(rng.integers(0, 1000)), 0, 0, 0,
+            int(rng.integers(1996, 2025)) if rng.random() > 0.1 else None,
+        ])
+    years = list(range(2015, 2025))
+    for sheet in ("ISSUANCES", "RETIREMENTS"):
+        ws = wb.create_sheet(sheet)
+        ws.append(["Voluntary Registry Offsets Database"])
+        ws.append([sheet.title()])
+        ws.append([])
+        ws.append(["Project ID", "Project Name", "Total Credits"] + years)
+        for project in ids[::2]:
+            ws.append([project, "n", 0] + [int(rng.integers(0, 1000)) for _ in years])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    wb.save(path)
+    return path
+
+
+@pytest.fixture(scope="session")
+def workbook(tmp_path_factory):
+    return write_workbook(str(tmp_path_factory.mktemp("release") / WORKBOOK))
+
+
+@pytest.fixture(scope="session")
+def dataset(workbook):
+    from offsets_data import load_dataset
+
+    return load_dataset(workbook, "PROJECTS", 3, use_artifacts=False)
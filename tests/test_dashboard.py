@@ -0,0 +1,30 @@
+import os
+
+from streamlit.testing.v1 import AppTest
+
+from conftest import ROOT
+
+
+def apply_filters(at):
+    # Sidebar edits are drafts until applied
+    button = at.button(key="apply_filters_btn")
+    if not button.disabled:
+        button.click().run()
+
+
+def test_region_survives_a_scope_edit(workbook, monkeypatch):
+    # The page reads its workbook from data/ under the working directory
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(workbook)))
+    at = AppTest.from_file(os.path.join(ROOT, "portfolio-dashboard.py"), default_timeout=120).run()
+    assert not at.exception
+
+    at.multiselect(key="region_sel").set_value(["Asia"]).run()
+    apply_filters(at)
+    # The Region labels carry facet counts that change with the Scope
+    at.multiselect(key="scope_sel").set_value(["Renewable Energy"]).run()
+    apply_filters(at)
+
+    assert not at.exception
+    assert at.session_state["region_sel"] == ["Asia"]
+    assert at.session_state["scope_sel"] == ["Renewable Energy"]
+    assert at.session_state["applied_filters"][0]["Region"] == ["Asia"]
@@ -0,0 +1,55 @@
+import pandas as pd
+
+from offsets_aggregates import REST_OF_WORLD, top_countries
+
+
+def projects(rows):
+    """Projects frame of (country, registry, how many) rows."""
+    return pd.DataFrame(
+        [(country, registry) for country, registry, n in rows for _ in range(n)],
+        columns=["Country", "Voluntary_Registry"],
+    ).astype("category")
+
+
+def test_top_countries_ranks_by_listed_registries():
+    df = projects([
+        ("Brazil", "VCS", 3), ("Brazil", "Gold Standard", 2),
+        ("Kenya", "GOLD", 4), ("Kenya", "Other", 9),
+        ("India", "CAR", 1),
+    ])
+    top = top_countries(df, k=2)
+    assert top["Country"].tolist() == ["Brazil", "Kenya"]
+    # Alternate names count towards their registry, unlisted ones not at all
+    assert top.set_index("Country").loc["Brazil", ["GOLD", "VCS", "Sum"]].tolist() == [2, 3, 5]
+    assert top.set_index("Country").loc["Kenya", "Sum"] == 4
+
+
+def test_top_countries_breaks_ties_at_k_in_label_order():
+    df = projects([("Peru", "VCS", 2), ("Chile", "VCS", 2), ("Ghana", "ACR", 2), ("Togo", "ACR", 5)])
+    top = top_countries(df, k=3)
+    assert top["Country"].tolist() == ["Togo", "Chile", "Ghana"]
+    assert top["Sum"].tolist() == [5, 2, 2]
+
+
+def test_top_countries_rest_of_world():
+    df = projects([
+        ("Peru", "VCS", 4), ("Chile", "VCS", 3), ("Ghana", "ACR", 2), ("Togo", "CAR", 1), ("Togo", "Other", 7),
+    ])
+    top = top_countries(df, k=2, rest=True)
+    assert top["Country"].tolist() == ["Peru", "Chile", REST_OF_WORLD]
+    rest = top.iloc[-1]
+    assert (rest["ACR"], rest["CAR"], rest["VCS"], rest["Sum"]) == (2, 1, 0, 3)
+    # Nobody left over: no rest row
+    assert REST_OF_WORLD not in top_countries(df, k=10, rest=True)["Country"].tolist()
+
+
+def test_top_countries_counts_cube_rows():
+    cube = projects([("Peru", "VCS", 1), ("Chile", "VCS", 1)])
+    cube["Counts"] = [1, 6]
+    assert top_countries(cube, k=1)["Sum"].tolist() == [6]
+
+
+def test_top_countries_empty_selection():
+    top = top_countries(projects([("Peru", "VCS", 1)]).iloc[:0], k=10, rest=True)
+    assert top.empty
+    assert top.columns[0] == "Country" and top.columns[-1] == "Sum"
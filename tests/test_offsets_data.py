@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from offsets_data import ReleaseArrays, ReleaseHistory, diff_releases, load_dataset
+
+
+def test_artifacts_map_the_indexes(workbook, dataset):
+    load_dataset(workbook, "PROJECTS", 3)  # writes precomputed/<version>/
+    mapped = load_dataset(workbook, "PROJECTS", 3)
+
+    words = mapped.bitmaps.words["Country"]
+    assert not words.flags.owndata and not words.flags.writeable
+    selection = {"Region": ["Asia", "Africa"], "Scope": ["Renewable Energy"]}
+    lo, hi = dataset.ranges.bounds("First_Vintage_Year")
+    assert (mapped.bitmaps.facet_counts(selection, [mapped.ranges.bitmap("First_Vintage_Year", lo + 3, hi)])
+            == dataset.bitmaps.facet_counts(selection, [dataset.ranges.bitmap("First_Vintage_Year", lo + 3, hi)]))
+    assert np.array_equal(mapped.bitmaps.select(selection), dataset.bitmaps.select(selection))
+    assert mapped.cube.slice(selection).equals(dataset.cube.slice(selection))
+    for query in ("wind", "project in kenya", "wnid project"):
+        (found, mode), (expected, expected_mode) = mapped.search.search(query), dataset.search.search(query)
+        assert mode == expected_mode and np.array_equal(found, expected)
+
+
+def release(rows):
+    """Projects frame of (Project ID, Country, status, credits issued) rows."""
+    df = pd.DataFrame(rows, columns=["Project ID", "Country", "Voluntary_Status", "Total_Credits_Issued"])
+    for c in ["Total_Credits_Retired", "Total_Credits_Remaining", "Total_Buffer_Pool_Deposits"]:
+        df[c] = 0
+    return df.astype({"Country": "category", "Voluntary_Status": "category"})
+
+
+OLD = release([
+    ("A1", "Kenya", "Registered", 100), ("A2", "Peru", None, 50),
+    ("A3", "Peru", "Listed", 10), ("A4", "India", "Listed", 5),
+])
+NEW = release([
+    ("A1", "Kenya", "Registered", 150), ("A2", "Peru", "Listed", 50),
+    ("A3", "Peru", "Listed", 10), ("A5", "Ghana", None, 7),
+])
+
+
+def test_diff_releases_added_removed_changed():
+    changes = diff_releases(ReleaseArrays("v1", OLD), ReleaseArrays("v2", NEW)).set_index("Project ID")
+    assert changes["Change"].to_dict() == {"A5": "added", "A4": "removed", "A1": "changed", "A2": "changed"}
+    assert changes["Delta_Total_Credits_Issued"].to_dict() == {"A5": 7, "A4": -5, "A1": 50, "A2": 0}
+    assert changes.loc["A4", "Country"] == "India" and changes.loc["A5", "Country"] == "Ghana"
+    # One missing-status value on both sides: None
+    assert changes.loc["A2", ["Status_Before", "Status_After"]].tolist() == [None, "Listed"]
+    assert changes.loc["A5", ["Status_Before", "Status_After"]].tolist() == [None, None]
+    assert changes.loc["A4", ["Status_Before", "Status_After"]].tolist() == ["Listed", None]
+
+
+def test_history_stores_the_diff_with_the_release(tmp_path):
+    history = ReleaseHistory(str(tmp_path))
+    history.ingest("v1", OLD, "aaa")
+    history.ingest("v2", NEW, "bbb")
+    history.prepare_diffs("v2")
+    assert os.path.exists(history.diff_path("v1", "v2"))
+
+    stored = ReleaseHistory(str(tmp_path)).diff("v1", "v2")
+    expected = diff_releases(ReleaseArrays("v1", OLD), ReleaseArrays("v2", NEW))
+    pd.testing.assert_frame_equal(stored, expected, check_dtype=False)
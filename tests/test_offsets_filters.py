@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from offsets_data import FILTER_COLS
+from offsets_filters import BitmapIndex, decode_link, encode_link
+
+OPTIONS = {
+    "Region": ["Africa", "Asia", "Europe"],
+    "Voluntary_Registry": ["ACR", "GOLD", "VCS"],
+    "Type": ["Cookstoves", "Wind | Solar", "REDD+"],
+}
+BOUNDS = {"Total_Credits_Issued": (0, 5000), "First_Vintage_Year": (1996, 2024)}
+COUNTRIES = ["Kenya", "Brazil", "Viet Nam"]
+
+
+def decode(params):
+    return decode_link(params, OPTIONS, BOUNDS.__getitem__, COUNTRIES)
+
+
+def test_link_round_trip():
+    selections = {"Region": ["Asia", "Africa"], "Type": ["Wind | Solar", "REDD+"], "Voluntary_Registry": []}
+    ranges = {"Total_Credits_Issued": (100, 4000), "First_Vintage_Year": (2005, 2015)}
+    params = encode_link(selections, ["Kenya", "Brazil"], ranges, "  cookstove ")
+
+    sel, countries, rng, search = decode(params)
+    assert {col: sorted(v) for col, v in sel.items()} == {
+        "Region": ["Africa", "Asia"], "Type": ["REDD+", "Wind | Solar"],
+    }
+    assert sorted(countries) == ["Brazil", "Kenya"]
+    assert rng == ranges
+    assert search == "cookstove"
+    # Canonical: equal states give equal links
+    assert encode_link(sel, countries, rng, search) == params
+
+
+def test_link_drops_unknown_values():
+    sel, countries, _, _ = decode({"region": "Asia|Atlantis", "registry": "XYZ", "map": "Kenya|Atlantis"})
+    assert sel == {"Region": ["Asia"]}
+    assert countries == ["Kenya"]
+
+
+def test_link_clamps_out_of_bounds_ranges():
+    _, _, rng, _ = decode({"issued": "1000000~inf", "vintage": "-inf~2000"})
+    assert rng == {"Total_Credits_Issued": (5000, 5000), "First_Vintage_Year": (1996, 2000)}
+    # Clamped to the full bounds: no range at all
+    assert decode({"issued": "-10~99999"})[2] == {}
+
+
+def test_link_drops_unparsable_and_inverted_ranges():
+    for raw in ("abc~10", "nan~10", "4000~100", "7"):
+        assert decode({"issued": raw})[2] == {}
+
+
+def brute_force(df, selections, skip=None):
+    """Rows of `df` matching every non-empty selection but the one on `skip`."""
+    keep = np.ones(len(df), dtype=bool)
+    for col, values in selections.items():
+        if values and col != skip:
+            keep &= df[col].isin(values).to_numpy()
+    return keep
+
+
+SELECTIONS = [
+    {},
+    {"Region": [], "Scope": []},
+    {"Region": ["Asia", "Africa"]},
+    {"Region": ["Asia", "Africa"], "Scope": ["Renewable Energy"], "Voluntary_Registry": ["VCS", "GOLD"]},
+    {"Country": ["Kenya"], "Region": ["Asia"]},  # nothing matches
+]
+
+
+@pytest.mark.parametrize("selections", SELECTIONS)
+def test_bitmap_select_matches_pandas(dataset, selections):
+    df = dataset.df
+    rows = BitmapIndex(df, FILTER_COLS).select(selections)
+    if not any(selections.values()):
+        assert rows is None
+    else:
+        assert rows.tolist() == np.flatnonzero(brute_force(df, selections)).tolist()
+
+
+@pytest.mark.parametrize("selections", SELECTIONS)
+def test_bitmap_facet_counts_match_pandas(dataset, selections):
+    df = dataset.df
+    facets = BitmapIndex(df, FILTER_COLS).facet_counts(selections)
+    assert set(facets) == set(FILTER_COLS)
+    for col, counts in facets.items():
+        expected = df.loc[brute_force(df, selections, skip=col), col].value_counts()
+        assert counts == {value: int(expected.get(value, 0)) for value in counts}
+        assert sum(counts.values()) == int(expected.sum())
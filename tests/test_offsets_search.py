@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from offsets_search import TrigramIndex
+
+PROJECTS = pd.DataFrame({
+    "Project ID": ["VCS1001", "GS2002", "ACR3003", "VCS1004", "CAR5005"],
+    "Project Name": [
+        "Kasigau Corridor REDD+", "Efficient cookstoves in Ghana", "Landfill gas capture",
+        "Wind farm Tamil Nadu", "Improved cookstoves in Kenya",
+    ],
+})
+
+
+def test_search_substring_in_id_or_name():
+    index = TrigramIndex(PROJECTS)
+    found, mode = index.search("COOKSTOVES")
+    assert mode == "substring" and found.tolist() == [1, 4]
+    found, mode = index.search("vcs10")
+    assert mode == "substring" and found.tolist() == [0, 3]
+    # A substring match never spans the ID and the name
+    assert index.search("1001kasigau")[1] == "fuzzy"
+
+
+def test_search_survives_swapped_letters():
+    found, mode = TrigramIndex(PROJECTS).search("cookstvoes")
+    assert mode == "fuzzy" and sorted(found.tolist()) == [1, 4]
+
+
+def test_search_fuzzy_needs_half_the_trigrams():
+    # Shares one trigram ("cor") with a name, out of eight
+    found, mode = TrigramIndex(PROJECTS).search("corkscrews")
+    assert mode == "fuzzy" and found.tolist() == []
+
+
+def test_search_within_rows():
+    index = TrigramIndex(PROJECTS)
+    rows = np.array([2, 3, 4])
+    assert index.search("cookstoves", rows=rows)[0].tolist() == [4]
+    assert index.search("cookstvoes", rows=rows)[0].tolist() == [4]
+    assert index.search("", rows=rows)[0].tolist() == [2, 3, 4]
+    assert index.search("vcs", rows=rows)[0].tolist() == [3]